@@ -0,0 +1,169 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from logging import Logger
+from pathlib import Path
+from typing import *
+
+import dill
+
+from pysimple.io import ensure_dir, dump_pickle, load_pickle
+from pysimple.logging import silent_logger
+from pysimple.utils import get_checksum
+
+# Prefix of files that are being written, they are not results yet
+TMP_PREFIX = '.tmp-'
+
+
+class ResultCache:
+    """
+    Cache of function results stored on disk with pickle, with LRU cache in memory in front of it.
+    Results are addressed by checksum of function name and pickled arguments.
+    Size of result is estimated by size of its file, memory cache keeps at most max_memory_bytes of results,
+    disk cache keeps at most max_disk_bytes of least recently used results.
+    Results not used for max_age seconds since they were stored or loaded from disk are dropped from both.
+    """
+
+    def __init__(
+            self, cache_dir: Union[str, Path], max_memory_bytes: int=2 ** 28, max_disk_bytes: int=None,
+            max_age: float=None, use_dill: bool=False, compress: bool=False, logger: Logger=silent_logger()):
+        self.cache_dir = ensure_dir(cache_dir)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age = max_age
+        self.use_dill = use_dill
+        self.suffix = '.pkl.gz' if compress else '.pkl'
+        self.logger = logger
+        self.memory_: OrderedDict = OrderedDict()
+        self.memory_bytes_ = 0
+
+    def key(self, func: Callable, args: Tuple, kwargs: Dict) -> str:
+        """Checksum of function call"""
+        serializer = dill if self.use_dill else pickle
+        call = (func.__module__, func.__qualname__, args, sorted(kwargs.items()))
+        return get_checksum(data=serializer.dumps(call, protocol=4))
+
+    def filepath(self, key: str) -> Path:
+        return self.cache_dir / (key + self.suffix)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return whether result was found and result itself"""
+        if key in self.memory_:
+            result, _, stored_at = self.memory_[key]
+            if self.max_age is None or time.time() - stored_at <= self.max_age:
+                self.memory_.move_to_end(key)
+                return True, result
+            # File may be refreshed by another process, so that its age is checked below
+            self._forget(key)
+
+        filepath = self.filepath(key)
+        if not filepath.exists():
+            return False, None
+        if self.max_age is not None and time.time() - filepath.stat().st_mtime > self.max_age:
+            filepath.unlink(missing_ok=True)
+            return False, None
+        try:
+            result = load_pickle(filepath, use_dill=self.use_dill, logger=self.logger)
+        except Exception as e:
+            # Corrupted result would fail each call otherwise, so it is recomputed instead
+            self.logger.warning('Could not load cached result from %s: %s', filepath, e)
+            filepath.unlink(missing_ok=True)
+            return False, None
+        # Loaded result becomes the most recently used on disk as well
+        os.utime(filepath)
+        stat = filepath.stat()
+        self._remember(key, result=result, nbytes=stat.st_size, stored_at=stat.st_mtime)
+        return True, result
+
+    def put(self, key: str, result: Any):
+        filepath = self.filepath(key)
+        # Write into temporary file first, so that killed process does not leave truncated result in cache
+        tmp_filepath = self.cache_dir / f'{TMP_PREFIX}{os.getpid()}-{threading.get_ident()}-{filepath.name}'
+        try:
+            dump_pickle(tmp_filepath, result, use_dill=self.use_dill, logger=self.logger)
+            os.replace(tmp_filepath, filepath)
+        finally:
+            tmp_filepath.unlink(missing_ok=True)
+        stat = filepath.stat()
+        self._remember(key, result=result, nbytes=stat.st_size, stored_at=stat.st_mtime)
+        self.evict()
+
+    def _remember(self, key: str, result: Any, nbytes: int, stored_at: float):
+        """Keep result in memory along with size and modification time of its file"""
+        if nbytes > self.max_memory_bytes:
+            return
+        self._forget(key)
+        self.memory_[key] = (result, nbytes, stored_at)
+        self.memory_bytes_ += nbytes
+        while self.memory_bytes_ > self.max_memory_bytes:
+            _, (_, evicted_nbytes, _) = self.memory_.popitem(last=False)
+            self.memory_bytes_ -= evicted_nbytes
+
+    def _forget(self, key: str):
+        if key in self.memory_:
+            _, nbytes, _ = self.memory_.pop(key)
+            self.memory_bytes_ -= nbytes
+
+    def _remove(self, filepath: Path):
+        filepath.unlink(missing_ok=True)
+        self._forget(filepath.name[:-len(self.suffix)])
+
+    def evict(self):
+        """Remove results from disk and memory that are too old or do not fit into max_disk_bytes"""
+        if self.max_disk_bytes is None and self.max_age is None:
+            return
+        now = time.time()
+        files = []
+        for filepath in self.cache_dir.glob('*' + self.suffix):
+            if filepath.name.startswith(TMP_PREFIX):
+                continue
+            stat = filepath.stat()
+            if self.max_age is not None and now - stat.st_mtime > self.max_age:
+                self._remove(filepath)
+            else:
+                files.append((stat.st_mtime, stat.st_size, filepath))
+        if self.max_disk_bytes is not None:
+            disk_bytes = sum(nbytes for _, nbytes, _ in files)
+            for _, nbytes, filepath in sorted(files):
+                if disk_bytes <= self.max_disk_bytes:
+                    break
+                self._remove(filepath)
+                disk_bytes -= nbytes
+
+    def clear(self):
+        """Remove all results from memory and disk"""
+        self.memory_.clear()
+        self.memory_bytes_ = 0
+        for filepath in self.cache_dir.glob('*' + self.suffix):
+            filepath.unlink(missing_ok=True)
+
+
+def memoize(
+        cache_dir: Union[str, Path], max_memory_bytes: int=2 ** 28, max_disk_bytes: int=None, max_age: float=None,
+        use_dill: bool=False, compress: bool=False, logger: Logger=silent_logger()) -> Callable[[Callable], Callable]:
+    """
+    Decorator to skip recomputation of function results across runs, see ResultCache.
+    Arguments of function must be picklable, cache is accessible as cache attribute of decorated function.
+    """
+    cache = ResultCache(
+        cache_dir=cache_dir, max_memory_bytes=max_memory_bytes, max_disk_bytes=max_disk_bytes, max_age=max_age,
+        use_dill=use_dill, compress=compress, logger=logger)
+
+    def decorator(func: Callable) -> Callable:
+
+        @wraps(func)
+        def func_with_cache(*args, **kwargs):
+            key = cache.key(func, args=args, kwargs=kwargs)
+            found, result = cache.get(key)
+            if not found:
+                result = func(*args, **kwargs)
+                cache.put(key, result)
+            return result
+
+        func_with_cache.cache = cache
+        return func_with_cache
+
+    return decorator
@@ -1,7 +1,12 @@
+import os
 import sys
 import shutil
 import json
+import bz2
 import gzip
+import hashlib
+import lzma
+import mmap
 import pickle
 from collections import defaultdict
 from contextlib import ExitStack
@@ -10,6 +15,7 @@ from pathlib import Path
 from typing import *
 
 import dill
+import numpy as np
 import pandas as pd
 
 from pysimple.logging import silent_logger
@@ -56,59 +62,236 @@ def read_lines(filepath: Union[str, Path], logger: Logger=silent_logger(), **kwa
     filepath = plain_path(filepath)
     kwargs.setdefault('mode', 'r')
     kwargs.setdefault('encoding', 'utf-8')
-    logger.info(f'Read lines from {filepath} ...')
+    logger.info('Read lines from %s ...', filepath)
     with filepath.open(**kwargs) as f:
         for line in f:
             yield line.rstrip()
 
 
-def write_lines(filepath: Union[str, Path], lines: List[str], logger: Logger=silent_logger(), **kwargs):
-    """Write lines into text file"""
+def _split_lines(data: bytes, encoding: str='utf-8', errors: str='strict') -> List[str]:
+    """Decode buffer of complete lines at once and split it into lines as read_lines() does"""
+    lines = data.decode(encoding, errors).split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    return [line.rstrip() for line in lines]
+
+
+def read_line_batches(
+        filepath: Union[str, Path], buffer_size: int=2 ** 24, start: int=0, end: int=None, encoding: str='utf-8',
+        errors: str='strict', logger: Logger=silent_logger()) -> Iterator[List[str]]:
+    """
+    Read lines from text file in batches, each batch is decoded from about buffer_size bytes at once.
+    Lines are read from byte range [start, end), that must be aligned to lines, see line_shards().
+    """
+    filepath = plain_path(filepath)
+    logger.info('Read lines from %s ...', filepath)
+    with filepath.open(mode='rb') as f:
+        f.seek(start)
+        n_left = float('inf') if end is None else end - start
+        tail = b''
+        while n_left > 0:
+            data = f.read(int(min(buffer_size, n_left)))
+            if not data:
+                break
+            n_left -= len(data)
+            # Incomplete last line is read with the next buffer
+            n_complete = data.rfind(b'\n') + 1
+            if n_complete == 0:
+                tail += data
+                continue
+            yield _split_lines(tail + data[:n_complete], encoding=encoding, errors=errors)
+            tail = data[n_complete:]
+        if tail:
+            yield _split_lines(tail, encoding=encoding, errors=errors)
+
+
+def line_shards(filepath: Union[str, Path], shards: int) -> List[Tuple[int, int]]:
+    """Split file into at most shards byte ranges [start, end) of about the same size, aligned to lines"""
+    filepath = plain_path(filepath)
+    size = filepath.stat().st_size
+    if size == 0:
+        return []
+    bounds = [0]
+    with filepath.open(mode='rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, shards):
+            bound = mm.find(b'\n', max(size * i // shards, bounds[-1])) + 1
+            if bound == 0:
+                break
+            bounds.append(bound)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def _count_newlines(start: int, end: int, filepath: Path, buffer_size: int=2 ** 24) -> int:
+    with filepath.open(mode='rb') as f:
+        f.seek(start)
+        n_newlines = 0
+        for offset in range(start, end, buffer_size):
+            n_newlines += f.read(min(buffer_size, end - offset)).count(b'\n')
+        return n_newlines
+
+
+def _map_line_shard(start: int, end: int, filepath: Path, lines_func: Callable, encoding: str, errors: str) -> Any:
+    with filepath.open(mode='rb') as f:
+        f.seek(start)
+        return lines_func(_split_lines(f.read(end - start), encoding=encoding, errors=errors))
+
+
+def map_lines(
+        filepath: Union[str, Path], workers: int, map_func: Callable[[List[str]], Any], shard_size: int=2 ** 26,
+        encoding: str='utf-8', errors: str='strict', **kwargs) -> Any:
+    """
+    Split text file into shards of about shard_size bytes aligned to lines and map lines of each shard
+    with map_func in parallel, other arguments are passed to parallel.map_reduce().
+    """
+    from pysimple.parallel import map_reduce
+
+    filepath = plain_path(filepath)
+    shards = line_shards(filepath, shards=max(1, -(-filepath.stat().st_size // shard_size)))
+    return map_reduce(
+        inputs=shards, workers=workers, map_func=_map_line_shard, filepath=filepath, lines_func=map_func,
+        encoding=encoding, errors=errors, **kwargs)
+
+
+def write_lines(
+        filepath: Union[str, Path], lines: List[str], logger: Logger=silent_logger(), batch_size: int=10_000,
+        **kwargs):
+    """Write lines into text file, batch of lines is joined and written at once"""
     filepath = ensure_filedir(filepath)
     kwargs.setdefault('mode', 'w')
     kwargs.setdefault('encoding', 'utf-8')
-    logger.info(f'Write {len(lines)} lines into {filepath} ...')
+    logger.info('Write %d lines into %s ...', len(lines), filepath)
     with filepath.open(**kwargs) as f:
-        for line in lines:
-            f.write(line + '\n')
-
-
-def load_pickle(filepath: Union[str, Path], use_dill: bool=False, logger: Logger=silent_logger()):
-    """Deserialize object with pickle"""
+        for i in range(0, len(lines), batch_size):
+            f.write('\n'.join(lines[i:i + batch_size]) + '\n')
+
+
+def _open_binary(filepath: Path, mode: str, compress_level: int=None, threads: int=0) -> BinaryIO:
+    """
+    Open binary file, compressed according to its extension: .gz, .bz2, .xz, .zst or .lz4,
+    zstd requires zstandard package and lz4 requires lz4 package.
+    """
+    suffix = filepath.suffix
+    if suffix == '.gz':
+        return gzip.open(filepath, mode=mode, compresslevel=9 if compress_level is None else compress_level)
+    if suffix == '.bz2':
+        return bz2.open(filepath, mode=mode, compresslevel=9 if compress_level is None else compress_level)
+    if suffix == '.xz':
+        return lzma.open(filepath, mode=mode, preset=compress_level if 'w' in mode else None)
+    if suffix == '.zst':
+        import zstandard
+        cctx = zstandard.ZstdCompressor(level=3 if compress_level is None else compress_level, threads=threads)
+        return zstandard.open(filepath, mode=mode, cctx=cctx)
+    if suffix == '.lz4':
+        import lz4.frame
+        return lz4.frame.open(filepath, mode=mode, compression_level=compress_level or 0)
+    return filepath.open(mode=mode)
+
+
+# Out-of-band buffers are aligned in file, so that arrays loaded from them are aligned in memory
+BUFFER_ALIGNMENT = 64
+
+
+def _buffers_path(filepath: Path) -> Path:
+    return filepath.with_name(filepath.name + '.buffers')
+
+
+def load_pickle(
+        filepath: Union[str, Path], use_dill: bool=False, logger: Logger=silent_logger(), mmap_mode: str='r'):
+    """
+    Deserialize object with pickle, file is decompressed according to its extension.
+    If object was dumped with out-of-band buffers, they are memory-mapped without copying, so processes
+    that load the same object share its memory. With mmap_mode='r' buffers are read-only,
+    with mmap_mode='c' they are writable, but changes are not written into file.
+    """
     filepath = plain_path(filepath)
-    logger.info(f'Load data from {filepath} ...')
+    logger.info('Load data from %s ...', filepath)
     serializer = dill if use_dill else pickle
-    compress = str(filepath).endswith('.gz')
-    file = gzip.open(filepath, mode='rb') if compress else filepath.open(mode='rb')
-    with file as f:
-        return serializer.load(f)
+    buffers_path = _buffers_path(filepath)
+    with _open_binary(filepath, mode='rb') as f:
+        if not buffers_path.exists():
+            return serializer.load(f)
+        buffer_positions = pickle.load(f)
+        if buffers_path.stat().st_size == 0:
+            # Empty file can not be memory-mapped, all buffers are empty then
+            buffers = [b''] * len(buffer_positions)
+        else:
+            with buffers_path.open(mode='rb') as buffers_file:
+                access = mmap.ACCESS_COPY if mmap_mode == 'c' else mmap.ACCESS_READ
+                buffers_map = memoryview(mmap.mmap(buffers_file.fileno(), 0, access=access))
+            buffers = [buffers_map[start:end] for start, end in buffer_positions]
+        return serializer.load(f, buffers=buffers)
+
+
+def _dump_buffers(filepath: Path, buffers: List[memoryview]) -> List[Tuple[int, int]]:
+    """Write buffers into file one after another, return their start and end positions"""
+    positions = []
+    with filepath.open(mode='wb') as f:
+        for buffer in buffers:
+            start = f.tell()
+            end = start + buffer.nbytes
+            f.write(buffer)
+            f.write(b'\0' * (-end % BUFFER_ALIGNMENT))
+            positions.append((start, end))
+    return positions
 
 
 def dump_pickle(
         filepath: Union[str, Path], obj: "serializable object", use_dill: bool=False, skip_fields: List[str]=None,
-        logger: Logger=silent_logger()):
-    """Serialize object with pickle"""
+        logger: Logger=silent_logger(), compress_level: int=None, threads: int=0, out_of_band: bool=False):
+    """
+    Serialize object with pickle, file is compressed according to its extension: .gz, .bz2, .xz, .zst or .lz4.
+    Level of compression trades speed for size, e.g. gzip with level 0 or zstd with negative levels barely
+    compress at all, but are as fast as raw write. Zstd compresses with threads, -1 means all cores.
+    With out_of_band=True object is pickled with protocol 5 and large buffers, like numpy arrays or columns
+    of pandas tables, are written without copying into separate uncompressed file next to it with .buffers suffix.
+    Dill pickles numpy arrays in-band, so out_of_band=True is not supported with use_dill=True.
+    """
+    if out_of_band and use_dill:
+        raise ValueError('Out-of-band buffers are not supported with dill!')
     filepath = ensure_filedir(filepath)
-    logger.info(f'Dump data into {filepath} ...')
+    logger.info('Dump data into %s ...', filepath)
     skip_fields = [] if not skip_fields else skip_fields
-    protocol = 2 if sys.version_info[0] == 2 else 4
+    protocol = 5 if out_of_band else 4
     serializer = dill if use_dill else pickle
-    compress = str(filepath).endswith('.gz')
-    with ExitStack() as stack, gzip.open(filepath, mode='wb') if compress else filepath.open(mode='wb') as file:
+    buffers_path = _buffers_path(filepath)
+    # Buffers of previous object would be loaded with new object otherwise
+    buffers_path.unlink(missing_ok=True)
+    buffers: List[memoryview] = []
+
+    def collect_buffer(buffer: pickle.PickleBuffer) -> bool:
+        try:
+            buffers.append(buffer.raw())
+        except BufferError:
+            # Non-contiguous buffer is pickled in-band
+            return True
+        return False
+
+    def dump(file: BinaryIO):
+        if out_of_band:
+            data = serializer.dumps(obj, protocol=protocol, buffer_callback=collect_buffer)
+            pickle.dump(_dump_buffers(buffers_path, buffers=buffers), file, protocol=protocol)
+            file.write(data)
+        else:
+            serializer.dump(obj, file, protocol=protocol)
+
+    with ExitStack() as stack, _open_binary(
+            filepath, mode='wb', compress_level=compress_level, threads=threads) as file:
         for field in skip_fields:
             stack.enter_context(CachedObject.parse_from(obj=obj, field=field))
         try:
-            serializer.dump(obj, file, protocol=protocol)
+            dump(file)
         except RecursionError:
             logger.warning('Set recursion limit to 10000!')
             sys.setrecursionlimit(10000)
-            serializer.dump(obj, file, protocol=protocol)
+            buffers.clear()
+            dump(file)
 
 
 def from_json(filepath: Union[str, Path], encoding='utf-8', logger: Logger=silent_logger(), **kwargs):
     """Load dictionary from json file"""
     filepath = plain_path(filepath)
-    logger.info(f'Load data from {filepath} ...')
+    logger.info('Load data from %s ...', filepath)
     with filepath.open(mode='r', encoding=encoding) as f:
         return json.load(f, **kwargs)
 
@@ -116,48 +299,301 @@ def from_json(filepath: Union[str, Path], encoding='utf-8', logger: Logger=silen
 def to_json(filepath: Union[str, Path], data: dict, encoding='utf-8', logger: Logger=silent_logger(), **kwargs):
     """Dump dictionary into json file"""
     filepath = ensure_filedir(filepath)
-    logger.info(f'Dump data to {filepath} ...')
+    logger.info('Dump data to %s ...', filepath)
     kwargs.setdefault('indent', 4)
     kwargs.setdefault('ensure_ascii', False)
     with filepath.open(mode='w', encoding=encoding) as f:
         json.dump(data, f, **kwargs)
 
 
-def count_lines(filepath: Union[str, Path], **kwargs) -> int:
-    """Count lines in file"""
-    filepath = plain_path(filepath)
-    kwargs.setdefault('mode', 'r')
-    kwargs.setdefault('encoding', 'utf-8')
-    with filepath.open(**kwargs) as f:
-        return sum(1 for _ in f)
-
-
-def from_tsv(filepath: Union[str, Path], logger: Logger=silent_logger(), **kwargs) -> pd.DataFrame:
-    """Load table from tsv file"""
+def count_lines(filepath: Union[str, Path], workers: int=1, **kwargs) -> int:
+    """
+    Count lines in file, newlines are counted in raw bytes of file shards in parallel by workers.
+    If kwargs of open() are passed, file is read line by line in text mode.
+    """
     filepath = plain_path(filepath)
+    if kwargs:
+        kwargs.setdefault('mode', 'r')
+        kwargs.setdefault('encoding', 'utf-8')
+        with filepath.open(**kwargs) as f:
+            return sum(1 for _ in f)
+
+    from pysimple.parallel import map_reduce
+
+    shards = line_shards(filepath, shards=workers)
+    if not shards:
+        return 0
+    if len(shards) == 1:
+        n_newlines = _count_newlines(*shards[0], filepath=filepath)
+    else:
+        n_newlines = sum(map_reduce(
+            inputs=shards, workers=workers, map_func=_count_newlines, progress_bar=None, filepath=filepath))
+    with filepath.open(mode='rb') as f:
+        f.seek(-1, os.SEEK_END)
+        # Last line may not end with newline
+        return n_newlines + (f.read(1) != b'\n')
+
+
+def _tsv_read_kwargs(filepath: Path, **kwargs) -> Dict[str, Any]:
     kwargs.setdefault('sep', '\t')
     kwargs.setdefault('na_values', NAN_IDENTIFIER)
     kwargs.setdefault('keep_default_na', False)
     kwargs.setdefault('dtype', object)
     if str(filepath).endswith('.gz'):
         kwargs.setdefault('compression', 'gzip')
-    logger.info(f'Load data from {filepath} ...')
-    return pd.read_csv(filepath, **kwargs)
+    return kwargs
 
 
-def to_tsv(filepath: Union[str, Path], data: pd.DataFrame, logger: Logger=silent_logger(), **kwargs):
-    """Write table into tsv file"""
-    filepath = ensure_filedir(filepath)
+def _tsv_write_kwargs(**kwargs) -> Dict[str, Any]:
     kwargs.setdefault('sep', '\t')
     kwargs.setdefault('na_rep', NAN_IDENTIFIER)
     kwargs.setdefault('encoding', 'utf-8')
     kwargs.setdefault('index', False)
+    return kwargs
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def compact_dtypes(data: pd.DataFrame, category_ratio: float=0.5) -> Dict[str, str]:
+    """
+    Infer compact dtypes of table columns: downcast integers, downcast floats without loss of precision,
+    convert strings into categories if number of unique values does not exceed category_ratio of rows.
+    """
+    dtypes = {}
+    for col in data.columns:
+        values = data[col]
+        dtype = values.dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            pass
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtype = pd.to_numeric(values, downcast='integer').dtype
+        elif pd.api.types.is_float_dtype(dtype):
+            float_values = values.to_numpy(dtype=np.float64)
+            if np.array_equal(float_values.astype(np.float32), float_values, equal_nan=True):
+                dtype = np.dtype(np.float32)
+        elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            if len(values) > 0 and values.nunique() <= category_ratio * len(values):
+                dtype = 'category'
+        dtypes[col] = str(dtype)
+    return dtypes
+
+
+def _schema_path(filepath: Path) -> Path:
+    return filepath.with_name(filepath.name + '.schema.json')
+
+
+def _load_schema(filepath: Path) -> Optional[Dict[str, str]]:
+    """Load dtypes inferred before, if file was not modified since then"""
+    schema_path = _schema_path(filepath)
+    if not schema_path.exists():
+        return None
+    schema = from_json(schema_path)
+    stat = filepath.stat()
+    if schema.get('mtime_ns') != stat.st_mtime_ns or schema.get('size') != stat.st_size:
+        return None
+    return schema['dtypes']
+
+
+def _dump_schema(filepath: Path, dtypes: Dict[str, str]):
+    stat = filepath.stat()
+    to_json(_schema_path(filepath), dict(mtime_ns=stat.st_mtime_ns, size=stat.st_size, dtypes=dtypes))
+
+
+def _override_dtypes(dtypes: Dict[str, str], dtype: Union[None, str, type, Dict[str, Any]]) -> Dict[str, Any]:
+    """Replace inferred dtypes of columns by dtype passed to read_csv(), either one for all columns or per column"""
+    if dtype is None:
+        return dtypes
+    if isinstance(dtype, dict):
+        return {**dtypes, **dtype}
+    return dict.fromkeys(dtypes, dtype)
+
+
+def _read_csv(filepath: Path, **kwargs) -> pd.DataFrame:
+    """Same as pd.read_csv(), but pyarrow engine treats na_values in text columns as missing as other engines do"""
+    data = pd.read_csv(filepath, **kwargs)
+    if kwargs.get('engine') != 'pyarrow' or kwargs.get('na_values') is None:
+        return data
+    na_values = kwargs['na_values']
+    for col in data.columns:
+        values = data[col]
+        if not (pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype)
+                or isinstance(values.dtype, pd.CategoricalDtype)):
+            continue
+        col_na_values = na_values.get(col, []) if isinstance(na_values, dict) else na_values
+        is_na = values.isin([col_na_values] if isinstance(col_na_values, str) else list(col_na_values))
+        if is_na.any():
+            values = values.mask(is_na)
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.cat.remove_unused_categories()
+            data[col] = values
+    return data
+
+
+def _read_tsv(
+        filepath: Path, logger: Logger, typed: bool, category_ratio: float, cache_schema: bool,
+        **kwargs) -> pd.DataFrame:
+    if not typed:
+        kwargs = _tsv_read_kwargs(filepath, **kwargs)
+        logger.info('Load data from %s ...', filepath)
+        return _read_csv(filepath, **kwargs)
+
+    # Types are inferred unless passed, passed ones take precedence over inferred ones
+    kwargs.setdefault('dtype', None)
+    kwargs = _tsv_read_kwargs(filepath, **kwargs)
+    if kwargs.get('engine', 'c') == 'c':
+        # Floats are parsed exactly as they were written
+        kwargs.setdefault('float_precision', 'round_trip')
+    dtypes = _load_schema(filepath) if cache_schema else None
+    if dtypes is not None:
+        logger.info('Load data from %s with cached schema ...', filepath)
+        return _read_csv(filepath, **{**kwargs, 'dtype': _override_dtypes(dtypes, dtype=kwargs['dtype'])})
+
+    logger.info('Load data from %s and infer schema ...', filepath)
+    data = _read_csv(filepath, **kwargs)
+    dtypes = compact_dtypes(data, category_ratio=category_ratio)
+    if cache_schema:
+        _dump_schema(filepath, dtypes=dtypes)
+    return data.astype(_override_dtypes(dtypes, dtype=kwargs['dtype']))
+
+
+def _cache_path(filepath: Path, **kwargs) -> Path:
+    """Path of binary copy of file, it depends on arguments of loading since they change loaded table"""
+    key = hashlib.md5(repr(sorted((k, repr(v)) for k, v in kwargs.items())).encode()).hexdigest()[:8]
+    return filepath.with_name(f'{filepath.name}.{key}.feather')
+
+
+def _file_order(columns: Iterable[str], usecols: Iterable[str]) -> List[str]:
+    """Columns of usecols in order of file, as read_csv() returns them"""
+    usecols = set(usecols)
+    missing = usecols.difference(columns)
+    if missing:
+        raise ValueError(f'Columns {",".join(sorted(missing))} are not found in file!')
+    return [col for col in columns if col in usecols]
+
+
+def _read_tsv_cached(
+        filepath: Path, logger: Logger, typed: bool, category_ratio: float, cache_schema: bool,
+        **kwargs) -> pd.DataFrame:
+    """Load table from binary copy of file if it is newer than file, otherwise load file and create its copy"""
+    from pyarrow import feather
+
+    usecols = kwargs.pop('usecols', None)
+    cache_path = _cache_path(filepath, typed=typed, category_ratio=category_ratio, **kwargs)
+    if cache_path.exists() and cache_path.stat().st_mtime_ns >= filepath.stat().st_mtime_ns:
+        logger.info('Load data from %s ...', cache_path)
+        table = feather.read_table(cache_path, memory_map=True)
+        if usecols is not None:
+            table = table.select(_file_order(table.column_names, usecols=usecols))
+        data = table.to_pandas()
+    else:
+        data = _read_tsv(
+            filepath, logger=logger, typed=typed, category_ratio=category_ratio, cache_schema=cache_schema, **kwargs)
+        logger.info('Cache data into %s ...', cache_path)
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        try:
+            feather.write_feather(data, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, cache_path)
+        except (ValueError, TypeError) as e:
+            logger.warning('Could not cache data into %s: %s', cache_path, e)
+            tmp_path.unlink(missing_ok=True)
+        if usecols is not None:
+            data = data[_file_order(data.columns, usecols=usecols)]
+    if not typed:
+        # Arrow loads text as strings, but untyped table consists of objects
+        data = data.astype({col: object for col, dtype in data.dtypes.items() if pd.api.types.is_string_dtype(dtype)})
+    # Arrow loads missing values of object columns as None, but read_csv() loads them as NaN
+    for col in data.columns[data.dtypes == object]:
+        data[col] = data[col].mask(data[col].isna(), np.nan)
+    return data
+
+
+def from_tsv(
+        filepath: Union[str, Path], logger: Logger=silent_logger(), typed: bool=False, category_ratio: float=0.5,
+        cache_schema: bool=False, cache: bool=False, **kwargs) -> pd.DataFrame:
+    """
+    Load table from tsv file, all values are loaded as strings by default.
+    With typed=True column types are inferred and compacted instead, see compact_dtypes().
+    Engine="pyarrow" loads faster, but unlike default engine it parses date-like text into dates.
+    With cache_schema=True inferred dtypes are stored next to file,
+    so that repeated loads of the same file skip inference.
+    With cache=True loaded table is also stored next to file in feather format and is loaded from there
+    with memory mapping as long as it is newer than file, usecols must be a list of column names then.
+    Cache requires pyarrow.
+    """
+    filepath = plain_path(filepath)
+    kwargs = dict(typed=typed, category_ratio=category_ratio, cache_schema=cache_schema, **kwargs)
+    if cache:
+        if _has_pyarrow():
+            return _read_tsv_cached(filepath, logger=logger, **kwargs)
+        logger.warning('Install pyarrow to cache %s!', filepath)
+    return _read_tsv(filepath, logger=logger, **kwargs)
+
+
+def iter_tsv(
+        filepath: Union[str, Path], chunk_size: int=100_000, logger: Logger=silent_logger(),
+        **kwargs) -> Iterator[pd.DataFrame]:
+    """Load table from tsv file in chunks of chunk_size rows, so that file does not have to fit into memory"""
+    filepath = plain_path(filepath)
+    kwargs = _tsv_read_kwargs(filepath, **kwargs)
+    kwargs['chunksize'] = chunk_size
+    logger.info('Load data from %s in chunks of %d rows ...', filepath, chunk_size)
+    with pd.read_csv(filepath, **kwargs) as reader:
+        yield from reader
+
+
+def to_tsv(filepath: Union[str, Path], data: pd.DataFrame, logger: Logger=silent_logger(), **kwargs):
+    """Write table into tsv file"""
+    filepath = ensure_filedir(filepath)
+    kwargs = _tsv_write_kwargs(**kwargs)
     if str(filepath).endswith('.gz'):
         kwargs.setdefault('compression', 'gzip')
-    logger.info(f'Dump {len(data)} rows into {filepath} ...')
+    logger.info('Dump %d rows into %s ...', len(data), filepath)
     data.to_csv(filepath, **kwargs)
 
 
+class TsvWriter:
+    """Context manager to write table into tsv file chunk by chunk, header is written only once"""
+
+    def __init__(self, filepath: Union[str, Path], logger: Logger=silent_logger(), **kwargs):
+        self.filepath = ensure_filedir(filepath)
+        self.logger = logger
+        self.kwargs = _tsv_write_kwargs(**kwargs)
+        self.file_ = None
+        self.columns_: pd.Index = None
+        self.n_rows_ = 0
+
+    def __enter__(self):
+        encoding = self.kwargs.pop('encoding')
+        if str(self.filepath).endswith('.gz'):
+            self.file_ = gzip.open(self.filepath, mode='wt', encoding=encoding, newline='')
+        else:
+            self.file_ = self.filepath.open(mode='w', encoding=encoding, newline='')
+        self.logger.info('Dump data into %s ...', self.filepath)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.file_.close()
+        self.logger.info('Dumped %d rows into %s', self.n_rows_, self.filepath)
+
+    def write(self, data: pd.DataFrame):
+        """Append chunk of table, its columns must be the same as columns of the first chunk"""
+        if self.columns_ is None:
+            self.columns_ = data.columns
+            header = self.kwargs.get('header', True)
+        elif not data.columns.equals(self.columns_):
+            raise ValueError(f'Columns of chunk {data.columns.tolist()} differ from {self.columns_.tolist()}!')
+        else:
+            header = False
+        data.to_csv(self.file_, **{**self.kwargs, 'header': header})
+        self.n_rows_ += len(data)
+
+
 def suffix_filename(path: Union[str, Path], suffix: str) -> Path:
     """Append suffix after filename"""
     path = plain_path(path)
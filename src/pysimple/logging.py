@@ -1,23 +1,35 @@
+import atexit
 import logging
+import multiprocessing as mp
+import os
+import threading
 from logging import Logger
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import BaseRotatingHandler, QueueHandler, TimedRotatingFileHandler
 from pathlib import Path
+from queue import Empty, Full, Queue
 from traceback import format_exc
 from typing import *
 
 
+# Loggers built by factories, repeated calls with the same arguments return the same logger instead of new handlers
+__LOGGERS__: Dict[Tuple, Logger] = {}
+__LOGGERS_LOCK__ = threading.Lock()
+
+
 class LoggerAdapter(logging.LoggerAdapter):
-    """Logger with prefix if necessary"""
+    """
+    Logger with prefix if necessary.
+    Message is prefixed only if its level is enabled, pass arguments of message separately to format it lazily too.
+    """
 
     def __init__(self, logger: Logger, prefix: Union[str, Tuple]=None):
         super(LoggerAdapter, self).__init__(logger, {})
         if isinstance(prefix, str):
             prefix = (prefix,)
-        prefix = ''.join([f'[{item}]' for item in prefix])
-        self.prefix = prefix
+        self.prefix = ''.join([f'[{item}]' for item in prefix or ()])
 
     def process(self, msg, kwargs):
-        if self.prefix is not None:
+        if self.prefix:
             msg = f'{self.prefix} {msg}'
         return msg, kwargs
 
@@ -39,53 +51,224 @@ def silent_logger() -> Logger:
     return logger
 
 
-def console_logger(name: str, prefix: Union[str, Tuple]=None) -> Union[LoggerAdapter, Logger]:
-    """Simple console logger"""
+def _handle_batch(handler: logging.Handler, records: List[logging.LogRecord]):
+    """Write records with one write and one flush if handler writes into stream, otherwise one by one"""
+    records = [record for record in records if record.levelno >= handler.level and handler.filter(record)]
+    if not records:
+        return
+    if not isinstance(handler, logging.StreamHandler) or isinstance(handler, BaseRotatingHandler) \
+            or handler.stream is None:
+        for record in records:
+            handler.handle(record)
+        return
+    handler.acquire()
+    try:
+        handler.stream.write(''.join(handler.format(record) + handler.terminator for record in records))
+        handler.flush()
+    except Exception:
+        handler.handleError(records[-1])
+    finally:
+        handler.release()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Handler that puts records into bounded queue, when queue is full it either waits or drops records.
+    With processes=True records dropped by forked processes are counted in shared memory as well,
+    otherwise forked processes pass records to handlers of listener directly, since nobody reads their queue.
+    """
+
+    def __init__(self, queue: Queue, drop: bool=False, processes: bool=False):
+        super(BoundedQueueHandler, self).__init__(queue)
+        self.drop = drop
+        self.processes = processes
+        self._pid = os.getpid()
+        self._dropped = mp.Value('q', 0) if processes else None
+        self._dropped_here = 0
+
+    @property
+    def dropped_(self) -> int:
+        """Number of dropped records"""
+        return self._dropped_here if self._dropped is None else self._dropped.value
+
+    def enqueue(self, record: logging.LogRecord):
+        if not self.processes and os.getpid() != self._pid:
+            for handler in self.listener.handlers:
+                handler.handle(record)
+            return
+        if not self.drop:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            if self._dropped is None:
+                self._dropped_here += 1
+            else:
+                with self._dropped.get_lock():
+                    self._dropped.value += 1
+
+
+class BatchQueueListener:
+    """
+    Thread that takes records from queue and passes them to handlers in batches of at most batch_size records,
+    each handler writes and flushes batch at once. Records dropped by queue_handler are reported with warning.
+    """
+
+    def __init__(
+            self, queue: Queue, handlers: List[logging.Handler], batch_size: int=100,
+            queue_handler: BoundedQueueHandler=None):
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.queue_handler = queue_handler
+        self.reported_dropped_ = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._pid = os.getpid()
+
+    def stop(self):
+        """Write all records logged so far and stop thread"""
+        # Forked process must not stop listener of its parent
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self.queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _dropped_record(self) -> Optional[logging.LogRecord]:
+        dropped = 0 if self.queue_handler is None else self.queue_handler.dropped_
+        if dropped == self.reported_dropped_:
+            return None
+        msg = f'Dropped {dropped - self.reported_dropped_} log records, because queue was full'
+        self.reported_dropped_ = dropped
+        return logging.makeLogRecord(dict(
+            name='pysimple.logging', levelno=logging.WARNING, levelname='WARNING', msg=msg))
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            records = [self.queue.get()]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            stopped = None in records
+            records = [record for record in records if record is not None]
+            dropped_record = self._dropped_record()
+            if dropped_record is not None:
+                records.append(dropped_record)
+            for handler in self.handlers:
+                _handle_batch(handler, records=records)
+
+
+def queue_logger(
+        logger: Union[LoggerAdapter, Logger], queue_size: int=10_000, drop: bool=False, batch_size: int=100,
+        processes: bool=False) -> Union[LoggerAdapter, Logger]:
+    """
+    Move handlers of logger behind queue, so that logging call only puts record into queue
+    and records are formatted and written by background thread in batches, see BatchQueueListener.
+    When queue of queue_size records is full, logging call either waits or, with drop=True, drops record.
+    With processes=True queue is shared with processes forked later, e.g. map_reduce workers,
+    so that all of them log into the same handlers of parent without interleaved writes.
+    Listener is accessible as listener attribute of queue handler and is stopped at exit.
+    """
+    base_logger = logger.logger if isinstance(logger, logging.LoggerAdapter) else logger
+    handlers = list(base_logger.handlers)
+    for handler in handlers:
+        base_logger.removeHandler(handler)
+    queue = mp.Queue(queue_size) if processes else Queue(queue_size)
+    queue_handler = BoundedQueueHandler(queue, drop=drop, processes=processes)
+    queue_handler.listener = BatchQueueListener(
+        queue, handlers=handlers, batch_size=batch_size, queue_handler=queue_handler)
+    base_logger.addHandler(queue_handler)
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+    return logger
+
+
+def _cached_logger(
+        key: Tuple, build: Callable[[], Logger], prefix: Union[str, Tuple]=None) -> Union[LoggerAdapter, Logger]:
+    with __LOGGERS_LOCK__:
+        if key not in __LOGGERS__:
+            __LOGGERS__[key] = build()
+        logger = __LOGGERS__[key]
+    return logger if prefix is None else LoggerAdapter(logger=logger, prefix=prefix)
+
+
+def _build_logger(name: str, handlers: List[logging.Handler], queued: bool, **queue_kwargs) -> Logger:
     logger = _default_logger(name)
     formatter = _default_formatter()
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    if prefix is not None:
-        logger = LoggerAdapter(logger=logger,  prefix=prefix)
-    return logger
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return queue_logger(logger, **queue_kwargs) if queued else logger
+
+
+def console_logger(
+        name: str, prefix: Union[str, Tuple]=None, queued: bool=False, queue_size: int=10_000, drop: bool=False,
+        processes: bool=False) -> Union[LoggerAdapter, Logger]:
+    """
+    Simple console logger, with queued=True it writes in background thread, see queue_logger() for queue_size,
+    drop and processes. Logger is built once per name, so it is cheap to call it repeatedly.
+    """
+    queue_kwargs = dict(queue_size=queue_size, drop=drop, processes=processes) if queued else {}
+    return _cached_logger(
+        key=('console', name, queued, *queue_kwargs.values()),
+        build=lambda: _build_logger(name, [logging.StreamHandler()], queued=queued, **queue_kwargs), prefix=prefix)
 
 
 def file_logger(
-        name: str, log_path: Path, console: bool=False, prefix: Union[str, Tuple]=None) -> Union[LoggerAdapter, Logger]:
-    """Simple file logger"""
+        name: str, log_path: Path, console: bool=False, prefix: Union[str, Tuple]=None, queued: bool=False,
+        queue_size: int=10_000, drop: bool=False, processes: bool=False) -> Union[LoggerAdapter, Logger]:
+    """
+    Simple file logger, with queued=True it writes in background thread, see queue_logger() for queue_size,
+    drop and processes. Logger is built once per name and file, so it is cheap to call it repeatedly.
+    """
     from pysimple.io import ensure_filedir
-    log_path = ensure_filedir(log_path)
-    logger = console_logger(name) if console else _default_logger(name)
-    formatter = _default_formatter()
-    file_handler = logging.FileHandler(log_path)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    if prefix is not None:
-        logger = LoggerAdapter(logger=logger, prefix=prefix)
-    return logger
+    log_path = ensure_filedir(log_path).resolve()
+    queue_kwargs = dict(queue_size=queue_size, drop=drop, processes=processes) if queued else {}
+
+    def build() -> Logger:
+        handlers = [logging.StreamHandler()] if console else []
+        return _build_logger(name, handlers + [logging.FileHandler(log_path)], queued=queued, **queue_kwargs)
+
+    return _cached_logger(
+        key=('file', name, log_path, console, queued, *queue_kwargs.values()), build=build, prefix=prefix)
 
 
 def daily_file_logger(
-        name: str, log_path: Path, console: bool=False, prefix: Union[str, Tuple]=None) -> Union[LoggerAdapter, Logger]:
-    """Logger that recreates log files per day"""
-    from pyjooble.io import ensure_filedir
-    log_path = ensure_filedir(log_path)
-    logger = console_logger(name) if console else _default_logger(name)
-    formatter = _default_formatter()
-    file_handler = TimedRotatingFileHandler(log_path, when='midnight', interval=1)
-    file_handler.suffix = '%Y-%m-%d'
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    if prefix is not None:
-        logger = LoggerAdapter(logger=logger, prefix=prefix)
-    return logger
+        name: str, log_path: Path, console: bool=False, prefix: Union[str, Tuple]=None, queued: bool=False,
+        queue_size: int=10_000, drop: bool=False, processes: bool=False) -> Union[LoggerAdapter, Logger]:
+    """
+    Logger that recreates log files per day, with queued=True it writes in background thread,
+    see queue_logger() for queue_size, drop and processes.
+    Logger is built once per name and file, so it is cheap to call it repeatedly.
+    """
+    from pysimple.io import ensure_filedir
+    log_path = ensure_filedir(log_path).resolve()
+    queue_kwargs = dict(queue_size=queue_size, drop=drop, processes=processes) if queued else {}
+
+    def build() -> Logger:
+        file_handler = TimedRotatingFileHandler(log_path, when='midnight', interval=1)
+        file_handler.suffix = '%Y-%m-%d'
+        handlers = [logging.StreamHandler()] if console else []
+        return _build_logger(name, handlers + [file_handler], queued=queued, **queue_kwargs)
+
+    return _cached_logger(
+        key=('daily_file', name, log_path, console, queued, *queue_kwargs.values()), build=build, prefix=prefix)
 
 
 def report_err(logger: logging.Logger, msg: str):
     """Report error message with traceback"""
     logger.error(msg)
-    logger.error(format_exc())
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error(format_exc())
 
 
 # Deprecated naming
@@ -1,59 +1,861 @@
+import asyncio
+import logging
+import math
 import multiprocessing as mp
+import os
+import pickle
+import signal
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
 from functools import partial
+from itertools import islice
+from multiprocessing import resource_tracker
+from multiprocessing.pool import ThreadPool
+from logging import Logger
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from time import perf_counter
 from typing import *
 
+import numpy as np
+import pandas as pd
 from tqdm import tqdm
 
+from pysimple.io import dump_pickle, load_pickle, plain_path, to_json
+from pysimple.logging import silent_logger
+from pysimple.utils import cumsplit, split_list
 
-__SENTINEL__ = 1
 
+# Keyword arguments passed to each map_func call in current worker thread, populated once per worker
+__WORKER__ = threading.local()
 
-def _map_func_wrapper(*args, map_func: Callable, que: mp.Queue, **kwargs):
-    res = map_func(*args, **kwargs)
-    que.put(__SENTINEL__)
-    return res
+# Shared keyword arguments of alive pools, forked workers inherit them without pickling
+__POOL_KWARGS__: Dict[int, Dict[str, Any]] = {}
 
+# Shared memory blocks attached by current worker, closed once worker completes its task
+__ATTACHED__: List[SharedMemory] = []
 
-def _tqdm_listener(que: mp.Queue, total: int, bar=tqdm):
-    progress_bar = bar(total=total)
-    for _ in iter(que.get, None):
-        progress_bar.update()
+# Shared memory blocks that are still mapped after task, because their views are referenced
+__UNCLOSED__: List[SharedMemory] = []
 
+# Smaller arrays are cheaper to pickle than to move into shared memory
+MIN_SHARED_NBYTES = 2 ** 16
 
-def map_reduce(
-        inputs: List, workers: int, map_func: Callable, reduce_func: Callable=None, reduce_init=None, progress_bar=tqdm,
-        **map_func_kwargs) -> "output of reduce_func or list of map_func outputs":
-    """Standard map-reduce routine to parallelize inputs between workers"""
+# Cost of input relative to mean cost of inputs that balanced chunks assume at least
+MIN_RELATIVE_COST = 0.01
 
-    if not isinstance(inputs[0], tuple):
-        inputs = [(inp,) for inp in inputs]
 
-    if workers > 1:
-        que: mp.Queue = None
-        tqdm_proc: mp.Process = None
-        if progress_bar:
-            que = mp.Manager().Queue()
-            tqdm_proc = mp.Process(target=_tqdm_listener, args=(que, len(inputs), progress_bar))
-            tqdm_proc.start()
-            map_func = partial(_map_func_wrapper, map_func=map_func, que=que, **map_func_kwargs)
+BACKENDS = ('process', 'thread', 'asyncio')
+
+
+def _init_worker(
+        pool_id: int, shared_kwargs: Optional[Dict], initializer: Optional[Callable], initargs: Tuple,
+        is_process: bool=True):
+    if is_process:
+        # Forked worker must not release shared memory attached by parent
+        __ATTACHED__.clear()
+        __UNCLOSED__.clear()
+    if shared_kwargs is None:
+        shared_kwargs = __POOL_KWARGS__.get(pool_id, {})
+    __WORKER__.kwargs = dict(shared_kwargs)
+    if initializer is not None:
+        __WORKER__.kwargs.update(initializer(*initargs) or {})
+
+
+def _check_backend(backend: str):
+    if backend not in BACKENDS:
+        raise ValueError(f'Invalid value of backend = {backend}, must be one of "{",".join(BACKENDS)}"!')
+
+
+def _attach_array(name: str, shape: Tuple, dtype: np.dtype) -> np.ndarray:
+    shm = SharedMemory(name=name)
+    __ATTACHED__.append(shm)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.flags.writeable = False
+    return array
+
+
+def _release_attached():
+    """Close shared memory blocks attached by worker, parent destroys them once it receives output of task"""
+    __UNCLOSED__.extend(__ATTACHED__)
+    __ATTACHED__.clear()
+    for shm in list(__UNCLOSED__):
+        try:
+            shm.close()
+        except BufferError:
+            # Array view is still referenced, e.g. by task output, try to close it after next task
+            continue
+        __UNCLOSED__.remove(shm)
+
+
+class SharedArray:
+    """
+    Numpy array moved into shared memory to be passed into worker process without serialization.
+    It is pickled as a name of shared memory block and unpickled by worker as read-only view of array.
+    Parent process owns the block and destroys it with unlink() once workers do not need it anymore.
+    """
+
+    def __init__(self, array: np.ndarray):
+        self.shm = SharedMemory(create=True, size=array.nbytes)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)[...] = array
+        self.name = self.shm.name
+        self.shape = array.shape
+        self.dtype = array.dtype
+        self.shm.close()
+
+    def __reduce__(self):
+        return _attach_array, (self.name, self.shape, self.dtype)
+
+    def unlink(self):
+        """Destroy shared memory block, workers that attached it keep their views until they close it"""
+        if self.shm is not None:
+            self.shm.unlink()
+            self.shm = None
+
+
+class _Reduced:
+    """Object that is unpickled as output of func(*args)"""
+
+    def __init__(self, func: Callable, *args):
+        self.func = func
+        self.args = args
+
+    def __reduce__(self):
+        return self.func, self.args
+
+
+def _build_series(values: np.ndarray, index: pd.Index, name) -> pd.Series:
+    return pd.Series(values, index=index, name=name, copy=False)
+
+
+def _build_frame(columns: List[pd.Series], column_names: pd.Index, index: pd.Index) -> pd.DataFrame:
+    data = pd.DataFrame(dict(enumerate(columns)), index=index, copy=False)
+    data.columns = column_names
+    return data
+
+
+def _is_shareable(array) -> bool:
+    return isinstance(array, np.ndarray) and array.dtype.kind in 'biufcmM' and array.nbytes >= MIN_SHARED_NBYTES
+
+
+def share(obj):
+    """
+    Move numeric arrays, Series and DataFrame columns into shared memory, so that worker gets them without copying.
+    Other objects are returned as is and pickled as usual. Caller destroys created SharedArray blocks with unlink().
+    """
+    if isinstance(obj, np.ndarray):
+        return SharedArray(obj) if _is_shareable(obj) else obj
+    if isinstance(obj, pd.Series):
+        values = obj.to_numpy()
+        if not _is_shareable(values) or values.dtype != obj.dtype:
+            return obj
+        return _Reduced(_build_series, SharedArray(values), obj.index, obj.name)
+    if isinstance(obj, pd.DataFrame):
+        columns = [share(obj.iloc[:, i]) for i in range(obj.shape[1])]
+        if not any(isinstance(column, _Reduced) for column in columns):
+            return obj
+        return _Reduced(_build_frame, columns, obj.columns, obj.index)
+    return obj
+
+
+def _shared_arrays(obj) -> Iterator[SharedArray]:
+    """Shared arrays that share() created for obj"""
+    if isinstance(obj, SharedArray):
+        yield obj
+    elif isinstance(obj, _CheckpointedChunk):
+        yield from _shared_arrays(obj.chunk)
+    elif isinstance(obj, (_Reduced, list, tuple)):
+        for arg in (obj.args if isinstance(obj, _Reduced) else obj):
+            yield from _shared_arrays(arg)
+
+
+def _share_chunk(chunk: Union[List[Tuple], "_CheckpointedChunk"]) -> Union[List[Tuple], "_CheckpointedChunk"]:
+    if isinstance(chunk, _CheckpointedChunk):
+        if chunk.chunk is not None:
+            chunk.chunk = _share_chunk(chunk.chunk)
+        return chunk
+    return [tuple(share(arg) for arg in args) for args in chunk]
+
+
+class _CheckpointedChunk:
+    """Chunk of inputs with output stored into file, inputs are not passed to worker if output is stored already"""
+
+    def __init__(self, filepath: Path, chunk: List[Tuple]):
+        self.filepath = filepath
+        self.n_inputs = len(chunk)
+        self.chunk = None if filepath.exists() else chunk
+
+    def __len__(self) -> int:
+        return self.n_inputs
+
+    def run(self, chunk_func: Callable, **kwargs):
+        if self.chunk is None:
+            return load_pickle(self.filepath)
+        outp = chunk_func(self.chunk, **kwargs)
+        # Write into temporary file first, so that killed job does not leave corrupted checkpoint
+        tmp_filepath = self.filepath.with_name(self.filepath.name + '.tmp')
+        dump_pickle(tmp_filepath, outp)
+        os.replace(tmp_filepath, self.filepath)
+        return outp
+
+
+@contextmanager
+def _time_limit(seconds: Optional[float]):
+    """Interrupt code block with TimeoutError after seconds, works only in main thread"""
+    if seconds is None:
+        yield
+        return
+
+    def interrupt(signum, frame):
+        raise TimeoutError(f'Task did not complete in {seconds} seconds!')
+
+    previous_handler = signal.signal(signal.SIGALRM, interrupt)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _retry(*args, map_func: Callable, retries: int, timeout: Optional[float], **kwargs):
+    """Call map_func at most retries + 1 times until it succeeds in time"""
+    for attempt in range(retries + 1):
+        try:
+            with _time_limit(timeout):
+                return map_func(*args, **kwargs)
+        except Exception:
+            if attempt == retries:
+                raise
+
+
+class _Progress:
+    """Progress of map_reduce, updated by parent with each delivered chunk, so workers do not report anything"""
+
+    def __init__(self, progress_bar, total: Optional[int]):
+        self.bar = progress_bar(total=total) if progress_bar else None
+        self.started_at_ = perf_counter()
+        # Time spent by each worker on mapping chunks
+        self.busy_: Dict[Hashable, float] = defaultdict(float)
+        self.n_inputs_ = 0
+
+    def update(self, n_inputs: int, worker: Hashable, busy: float):
+        self.n_inputs_ += n_inputs
+        self.busy_[worker] += busy
+        if self.bar is not None:
+            self.bar.update(n_inputs)
+            if hasattr(self.bar, 'set_postfix_str'):
+                self.bar.set_postfix_str(self.describe(), refresh=False)
+
+    def throughput(self) -> float:
+        """Mapped inputs per second"""
+        return self.n_inputs_ / max(perf_counter() - self.started_at_, 1e-9)
+
+    def utilization(self) -> Dict[Hashable, float]:
+        """Fraction of time each worker was busy"""
+        elapsed = max(perf_counter() - self.started_at_, 1e-9)
+        return {worker: min(busy / elapsed, 1.) for worker, busy in self.busy_.items()}
+
+    def describe(self) -> str:
+        """Utilization of workers, throughput is already reported by progress bar"""
+        utilization = sorted(self.utilization().values())
+        if not utilization:
+            return ''
+        mean_utilization = sum(utilization) / len(utilization)
+        return f'utilization={mean_utilization:.0%} [{utilization[0]:.0%}..{utilization[-1]:.0%}]'
+
+    def close(self):
+        if self.bar is not None:
+            self.bar.close()
+
+
+def _peak_rss() -> Optional[int]:
+    """Peak resident set size of current process in bytes"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Linux reports kilobytes, macOS reports bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+class TaskMetrics:
+    """
+    Collector of metrics of map_reduce tasks, pass it as metrics argument of map_reduce and inspect it afterwards.
+    Task is a chunk of inputs, for each task collector records its latency from submission till its output
+    is received by parent, time spent by worker on pickling and unpickling of inputs and outputs versus mapping,
+    worker that ran it and peak RSS of that worker. Timestamps are seconds since epoch.
+    """
+
+    def __init__(self):
+        self.tasks_: List[Dict[str, Any]] = []
+        self.started_at_: float = None
+        self.finished_at_: float = None
+
+    def start(self):
+        if self.started_at_ is None:
+            self.started_at_ = time.time()
+
+    def stop(self):
+        self.finished_at_ = time.time()
+
+    def submit(self, chunk: Any, serialize: bool) -> Tuple[Dict[str, Any], Any]:
+        """Record submission of chunk, pickle it in advance to measure time of pickling"""
+        task = dict(n_inputs=len(chunk), submitted_at=time.time())
+        if serialize:
+            started_at = perf_counter()
+            chunk = pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL)
+            task.update(input_dump_time=perf_counter() - started_at, input_bytes=len(chunk))
+        return task, chunk
+
+    def receive(self, task: Dict[str, Any], outp: Any, serialize: bool) -> Any:
+        """Record received output of task, unpickle it if worker pickled it"""
+        if serialize:
+            started_at = perf_counter()
+            outp = pickle.loads(outp)
+            task['output_load_time'] = perf_counter() - started_at
+        task['received_at'] = time.time()
+        self.tasks_.append(task)
+        return outp
+
+    @staticmethod
+    def _serialization_time(task: Dict[str, Any]) -> float:
+        return sum(task.get(key, 0.) for key in (
+            'input_dump_time', 'input_load_time', 'output_dump_time', 'output_load_time'))
+
+    def workers(self) -> Dict[str, Dict[str, Any]]:
+        """Number of tasks, busy and idle time and peak RSS per worker"""
+        elapsed = (self.finished_at_ or time.time()) - (self.started_at_ or time.time())
+        workers = {}
+        for task in self.tasks_:
+            worker = workers.setdefault(f'{task["pid"]}-{task["tid"]}', dict(tasks=0, busy_time=0., peak_rss=None))
+            worker['tasks'] += 1
+            worker['busy_time'] += task['finished_at'] - task['started_at']
+            if task['peak_rss'] is not None:
+                worker['peak_rss'] = max(worker['peak_rss'] or 0, task['peak_rss'])
+        for worker in workers.values():
+            worker['idle_time'] = max(elapsed - worker['busy_time'], 0.)
+        return workers
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totals over all tasks: compute time of map function, serialization time of inputs and outputs,
+        queue time that tasks spent waiting for workers and in transport, idle time of workers,
+        along with percentiles of latency of tasks.
+        """
+        if not self.tasks_:
+            return dict(tasks=0)
+        latency = np.array([task['received_at'] - task['submitted_at'] for task in self.tasks_])
+        compute_time = sum(task['compute_time'] for task in self.tasks_)
+        serialization_time = sum(map(self._serialization_time, self.tasks_))
+        queue_time = sum(
+            task['received_at'] - task['submitted_at'] - (task['finished_at'] - task['started_at'])
+            - task.get('input_dump_time', 0.) - task.get('output_load_time', 0.) for task in self.tasks_)
+        workers = self.workers()
+        peak_rss = [worker['peak_rss'] for worker in workers.values() if worker['peak_rss'] is not None]
+        return dict(
+            tasks=len(self.tasks_), inputs=sum(task['n_inputs'] for task in self.tasks_),
+            elapsed=(self.finished_at_ or time.time()) - self.started_at_, workers=len(workers),
+            compute_time=compute_time, serialization_time=serialization_time, queue_time=max(queue_time, 0.),
+            idle_time=sum(worker['idle_time'] for worker in workers.values()),
+            latency_p50=np.percentile(latency, 50), latency_p95=np.percentile(latency, 95), latency_max=latency.max(),
+            peak_rss=max(peak_rss) if peak_rss else None)
+
+    def log(self, logger: Logger, level: int=logging.INFO):
+        if not logger.isEnabledFor(level):
+            return
+        summary = ', '.join(
+            f'{key}={value:.6g}' if isinstance(value, float) else f'{key}={value}'
+            for key, value in self.summary().items())
+        logger.log(level, 'Tasks: %s', summary)
+
+    def trace(self) -> Dict[str, Any]:
+        """Trace of tasks in Chrome trace event format, viewable in chrome://tracing or Perfetto"""
+        events = []
+        for i, task in enumerate(self.tasks_):
+            ids = dict(pid=task['pid'], tid=task['tid'])
+            started_at = task['started_at']
+            events.append(dict(
+                name=f'task {i}', cat='task', ph='X', ts=1e6 * started_at,
+                dur=1e6 * (task['finished_at'] - started_at), args=dict(n_inputs=task['n_inputs']), **ids))
+            for name in ('input_load', 'compute', 'output_dump'):
+                duration = task.get(f'{name}_time')
+                if duration is not None:
+                    events.append(dict(name=name, cat=name, ph='X', ts=1e6 * started_at, dur=1e6 * duration, **ids))
+                    started_at += duration
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def dump_trace(self, filepath: Union[str, Path], logger: Logger=silent_logger()):
+        to_json(filepath, data=self.trace(), logger=logger, indent=None)
+
+
+def _iter_args(inputs: Iterable) -> Iterator[Tuple]:
+    """Iterate over inputs as tuples of map_func positional arguments"""
+    inputs = iter(inputs)
+    for inp in inputs:
+        if isinstance(inp, tuple):
+            yield inp
+            yield from inputs
         else:
-            map_func = partial(map_func, **map_func_kwargs)
-
-        with mp.Pool(workers) as p:
-            outputs = p.starmap(map_func, inputs)
-
-        if progress_bar:
-            que.put(None)
-            tqdm_proc.join()
-    else:
-        if progress_bar:
-            inputs = progress_bar(inputs)
-        outputs = [map_func(*inp, **map_func_kwargs) for inp in inputs]
-
-    if reduce_func is None:
-        return outputs
-    else:
-        reduced_outp = reduce_func(outputs[0], reduce_init)
-        for outp in outputs[1:]:
+            yield (inp,)
+            yield from ((inp_,) for inp_ in inputs)
+
+
+def _iter_chunks(items: Iterable, chunk_size: int) -> Iterator[List]:
+    """Lazily split items into lists of chunk_size items"""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _throttle(items: Iterable, slots: threading.Semaphore, stop: threading.Event) -> Iterator:
+    """Hold back next item until consumer frees a slot, this bounds the number of items in flight"""
+    for item in items:
+        slots.acquire()
+        if stop.is_set():
+            return
+        yield item
+
+
+def _map_chunk(chunk: List[Tuple], map_func: Callable, **kwargs) -> List:
+    kwargs = {**getattr(__WORKER__, 'kwargs', {}), **kwargs}
+    return [map_func(*args, **kwargs) for args in chunk]
+
+
+def _map_reduce_chunk(chunk: List[Tuple], map_func: Callable, reduce_func: Callable, **kwargs):
+    """Map chunk and reduce its outputs without reduce_init"""
+    outputs = iter(_map_chunk(chunk, map_func=map_func, **kwargs))
+    reduced_outp = next(outputs)
+    for outp in outputs:
+        reduced_outp = reduce_func(outp, reduced_outp)
+    return reduced_outp
+
+
+def _worker_id() -> Tuple[int, int]:
+    return os.getpid(), threading.get_ident()
+
+
+def _run_chunk(chunk: List[Tuple], chunk_func: Callable, **kwargs) -> Tuple[Any, int, Tuple[int, int], float]:
+    """Run chunk_func on chunk, return its output along with number of inputs, worker id and time spent"""
+    started_at = perf_counter()
+    try:
+        if isinstance(chunk, _CheckpointedChunk):
+            outp = chunk.run(chunk_func, **kwargs)
+        else:
+            outp = chunk_func(chunk, **kwargs)
+    finally:
+        _release_attached()
+    return outp, len(chunk), _worker_id(), perf_counter() - started_at
+
+
+def _run_measured_chunk(
+        task_chunk: Tuple[Dict[str, Any], Any], run_chunk: Callable, serialize: bool) -> Tuple[Any, int, Tuple, float]:
+    """Run chunk as _run_chunk() does, record metrics of task and return them along with output"""
+    task, chunk = task_chunk
+    task['started_at'] = time.time()
+    if serialize:
+        started_at = perf_counter()
+        chunk = pickle.loads(chunk)
+        task['input_load_time'] = perf_counter() - started_at
+    outp, n_inputs, worker, busy = run_chunk(chunk)
+    task.update(pid=worker[0], tid=worker[1], compute_time=busy, peak_rss=_peak_rss())
+    if serialize:
+        started_at = perf_counter()
+        outp = pickle.dumps(outp, protocol=pickle.HIGHEST_PROTOCOL)
+        task.update(output_dump_time=perf_counter() - started_at, output_bytes=len(outp))
+    task['finished_at'] = time.time()
+    return (task, outp), n_inputs, worker, busy
+
+
+def _run_numbered_chunk(numbered_chunk: Tuple[int, Any], run_chunk: Callable) -> Tuple[int, Any]:
+    """Run chunk and return its number along with output, so that parent knows which chunk is completed"""
+    i, chunk = numbered_chunk
+    if isinstance(chunk, bytes):
+        chunk = pickle.loads(chunk)
+    return i, run_chunk(chunk)
+
+
+def _imap_chunks(
+        pool: Optional[mp.Pool], chunks: Iterable[List[Tuple]], chunk_func: Callable, ordered: bool, window: int,
+        progress: _Progress, shared_memory: bool=False, checkpoint_dir: Path=None,
+        metrics: TaskMetrics=None) -> Iterator:
+    """
+    Feed chunks to pool lazily, at most window chunks are submitted but not yet consumed.
+    Yield chunk_func outputs and update progress as they arrive, run chunks serially if pool is None.
+    With metrics chunks and outputs are pickled explicitly when they are passed to processes, to measure it.
+    """
+    if checkpoint_dir is not None:
+        # Size of chunk is a part of file name, so that outputs of differently chunked inputs are not mixed up
+        chunks = (
+            _CheckpointedChunk(filepath=checkpoint_dir / f'{i:06d}-{len(chunk)}.pkl', chunk=chunk)
+            for i, chunk in enumerate(chunks))
+    chunk_func = partial(_run_chunk, chunk_func=chunk_func)
+    serialize = pool is not None and not isinstance(pool, ThreadPool)
+    if metrics is not None:
+        metrics.start()
+        chunk_func = partial(_run_measured_chunk, run_chunk=chunk_func, serialize=serialize)
+
+    def submit(chunk: Any) -> Any:
+        return chunk if metrics is None else metrics.submit(chunk, serialize=serialize)
+
+    def receive(outp: Any) -> Any:
+        return outp if metrics is None else metrics.receive(*outp, serialize=serialize)
+
+    if pool is None:
+        try:
+            for outp, n_inputs, worker, busy in map(chunk_func, map(submit, chunks)):
+                progress.update(n_inputs=n_inputs, worker=worker, busy=busy)
+                yield receive(outp)
+        finally:
+            if metrics is not None:
+                metrics.stop()
+        return
+
+    slots = threading.Semaphore(window)
+    stop = threading.Event()
+    # Shared arrays of chunks in flight by number of chunk, parent destroys them once output of chunk arrives
+    shared: Dict[int, List[SharedArray]] = {}
+    shared_lock = threading.Lock()
+
+    def numbered_tasks() -> Iterator[Tuple[int, Any]]:
+        for i, chunk in enumerate(_throttle(chunks, slots=slots, stop=stop)):
+            if shared_memory:
+                with shared_lock:
+                    if stop.is_set():
+                        return
+                    chunk = _share_chunk(chunk)
+                    shared[i] = list(_shared_arrays(chunk))
+                if metrics is None:
+                    # Terminated pool unpickles queued tasks in parent, they must not attach destroyed blocks
+                    chunk = pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL)
+            yield i, submit(chunk)
+
+    def unlink_shared(i: int):
+        for array in shared.pop(i, ()):
+            array.unlink()
+
+    imap = pool.imap if ordered else pool.imap_unordered
+    try:
+        for i, (outp, n_inputs, worker, busy) in imap(
+                partial(_run_numbered_chunk, run_chunk=chunk_func), numbered_tasks()):
+            unlink_shared(i)
+            slots.release()
+            progress.update(n_inputs=n_inputs, worker=worker, busy=busy)
+            yield receive(outp)
+    finally:
+        # Wake up pool task handler if it waits for a free slot
+        stop.set()
+        slots.release()
+        with shared_lock:
+            for i in list(shared):
+                unlink_shared(i)
+        if metrics is not None:
+            metrics.stop()
+
+
+def _reduce(outputs: Iterable, reduce_func: Callable, reduce_init=None):
+    reduced_outp = reduce_init
+    for outp in outputs:
+        reduced_outp = reduce_func(outp, reduced_outp)
+    return reduced_outp
+
+
+def _default_chunk_size(inputs: Iterable, workers: int) -> int:
+    """Same heuristic as Pool.map() uses: about 4 chunks per worker"""
+    return max(1, math.ceil(len(inputs) / (4 * workers))) if isinstance(inputs, Sized) else 1
+
+
+def _map_reduce_tree(
+        pool: mp.Pool, workers: int, inputs: Iterable, map_func: Callable, reduce_func: Callable, reduce_init,
+        progress_bar, chunk_size: int, shared_memory: bool, checkpoint_dir: Optional[Path],
+        metrics: Optional[TaskMetrics], **map_func_kwargs):
+    """
+    Reduce each chunk inside of workers, then combine partial outputs pairwise in log(chunks) parallel rounds.
+    Order of outputs is preserved, so result equals to serial reduction as long as reduce_func is associative.
+    """
+    total = len(inputs) if isinstance(inputs, Sized) else None
+    chunks = _iter_chunks(_iter_args(inputs), chunk_size=chunk_size)
+    chunk_func = partial(_map_reduce_chunk, map_func=map_func, reduce_func=reduce_func, **map_func_kwargs)
+    progress = _Progress(progress_bar=progress_bar, total=total)
+    try:
+        partial_outputs = list(_imap_chunks(
+            pool, chunks, chunk_func=chunk_func, ordered=True, window=2 * workers, progress=progress,
+            shared_memory=shared_memory, checkpoint_dir=checkpoint_dir, metrics=metrics))
+    finally:
+        progress.close()
+
+    if not partial_outputs:
+        return reduce_init
+
+    while len(partial_outputs) > 1:
+        # Later output goes first, the same way as in serial reduction
+        pairs = list(zip(partial_outputs[1::2], partial_outputs[::2]))
+        reduced_outputs = pool.starmap(reduce_func, pairs, chunksize=1)
+        if len(partial_outputs) % 2 == 1:
+            reduced_outputs.append(partial_outputs[-1])
+        partial_outputs = reduced_outputs
+    return reduce_func(partial_outputs[0], reduce_init)
+
+
+def _map_reduce_stream(
+        pool: Optional[mp.Pool], workers: int, inputs: Iterable, map_func: Callable, reduce_func: Callable,
+        reduce_init, progress_bar, chunk_size: int, ordered: bool, shared_memory: bool, checkpoint_dir: Optional[Path],
+        metrics: Optional[TaskMetrics], **map_func_kwargs):
+    """Map inputs chunk by chunk and reduce outputs as soon as they arrive, map serially if pool is None"""
+    total = len(inputs) if isinstance(inputs, Sized) else None
+    chunks = _iter_chunks(_iter_args(inputs), chunk_size=chunk_size)
+    chunk_func = partial(_map_chunk, map_func=map_func, **map_func_kwargs)
+    progress = _Progress(progress_bar=progress_bar, total=total)
+    try:
+        chunk_outputs = _imap_chunks(
+            pool, chunks, chunk_func=chunk_func, ordered=ordered, window=2 * workers, progress=progress,
+            shared_memory=shared_memory, checkpoint_dir=checkpoint_dir, metrics=metrics)
+        outputs = (outp for outputs in chunk_outputs for outp in outputs)
+        return list(outputs) if reduce_func is None else _reduce(outputs, reduce_func, reduce_init)
+    finally:
+        progress.close()
+
+
+def _balance_chunks(costs: Sequence[float], n_chunks: int) -> List[List[int]]:
+    """Split positions of inputs into chunks of equal total cost, chunks with the most costly inputs go first"""
+    costs = np.asarray(costs, dtype=float)
+    # Input of zero cost still takes time to map, so that such inputs are not all put into one chunk
+    costs = np.maximum(costs, costs.mean() * MIN_RELATIVE_COST) if costs.any() else np.ones(len(costs))
+    order = np.argsort(costs, kind='stable').tolist()
+    splits = cumsplit(items=costs[order], n_splits=n_chunks)
+    chunks = [chunk for chunk in split_list(items=order, splits=splits) if chunk]
+    return chunks[::-1]
+
+
+def _map_reduce_balanced(
+        pool: mp.Pool, workers: int, inputs: Iterable, map_func: Callable, reduce_func: Callable, reduce_init,
+        progress_bar, chunk_size: int, costs: Union[Sequence[float], Callable], shared_memory: bool,
+        checkpoint_dir: Optional[Path], metrics: Optional[TaskMetrics], **map_func_kwargs):
+    """
+    Map inputs in chunks of equal total cost, starting from the most costly ones, so that no worker is left behind.
+    Outputs are returned and reduced in order of inputs.
+    """
+    inputs = list(_iter_args(inputs))
+    if callable(costs):
+        costs = [costs(*args) for args in inputs]
+    if len(costs) != len(inputs):
+        raise ValueError(f'Got {len(costs)} costs for {len(inputs)} inputs!')
+    chunk_inds = _balance_chunks(costs=costs, n_chunks=math.ceil(len(inputs) / chunk_size))
+    chunks = ([inputs[i] for i in inds] for inds in chunk_inds)
+    chunk_func = partial(_map_chunk, map_func=map_func, **map_func_kwargs)
+    progress = _Progress(progress_bar=progress_bar, total=len(inputs))
+    outputs = [None] * len(inputs)
+    try:
+        chunk_outputs = _imap_chunks(
+            pool, chunks, chunk_func=chunk_func, ordered=True, window=2 * workers, progress=progress,
+            shared_memory=shared_memory, checkpoint_dir=checkpoint_dir, metrics=metrics)
+        for inds, outps in zip(chunk_inds, chunk_outputs):
+            for i, outp in zip(inds, outps):
+                outputs[i] = outp
+    finally:
+        progress.close()
+    return outputs if reduce_func is None else _reduce(outputs, reduce_func, reduce_init)
+
+
+async def _amap(
+        inputs: Iterable, workers: int, map_func: Callable, ordered: bool, progress: _Progress, retries: int,
+        timeout: Optional[float], **map_func_kwargs) -> AsyncIterator:
+    """Await at most workers coroutines at once, yield their outputs as they arrive"""
+    free_slots = list(range(workers))
+
+    async def run(args: Tuple):
+        slot = free_slots.pop()
+        started_at = perf_counter()
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    return await asyncio.wait_for(map_func(*args, **map_func_kwargs), timeout=timeout)
+                except Exception:
+                    if attempt == retries:
+                        raise
+        finally:
+            progress.update(n_inputs=1, worker=slot, busy=perf_counter() - started_at)
+            free_slots.append(slot)
+
+    inputs = _iter_args(inputs)
+    pending = deque()
+    try:
+        while True:
+            for args in islice(inputs, workers - len(pending)):
+                pending.append(asyncio.ensure_future(run(args)))
+            if not pending:
+                return
+            if ordered:
+                yield await pending.popleft()
+            else:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _map_reduce_async(
+        workers: int, inputs: Iterable, map_func: Callable, reduce_func: Callable, reduce_init, progress_bar,
+        ordered: bool, retries: int, timeout: Optional[float], **map_func_kwargs):
+    """Map inputs with coroutine map_func in event loop, reduce outputs as soon as they arrive"""
+
+    async def run():
+        outputs = _amap(
+            inputs=inputs, workers=workers, map_func=map_func, ordered=ordered, progress=progress, retries=retries,
+            timeout=timeout, **map_func_kwargs)
+        if reduce_func is None:
+            return [outp async for outp in outputs]
+        reduced_outp = reduce_init
+        async for outp in outputs:
             reduced_outp = reduce_func(outp, reduced_outp)
         return reduced_outp
+
+    total = len(inputs) if isinstance(inputs, Sized) else None
+    progress = _Progress(progress_bar=progress_bar, total=total)
+    try:
+        return asyncio.run(run())
+    finally:
+        progress.close()
+
+
+class WorkerPool:
+    """
+    Pool of workers that may be reused between map_reduce calls without respawning processes.
+    Heavy objects, like models or lookup tables, are passed to workers once instead of being pickled with each task:
+    shared_kwargs and dictionary returned by initializer(*initargs) are loaded once per worker
+    and passed to each map_func call as keyword arguments.
+    With fork start method shared_kwargs are inherited by workers copy-on-write without pickling.
+    Workers are either processes or, for I/O-bound map functions, threads.
+    """
+
+    def __init__(
+            self, workers: int, initializer: Callable=None, initargs: Tuple=(), shared_kwargs: Dict[str, Any]=None,
+            context: str=None, backend: str='process'):
+        if backend not in ('process', 'thread'):
+            raise ValueError(f'Invalid value of backend = {backend}, must be one of "process,thread"!')
+        self.workers = workers
+        self.backend = backend
+        self.id_ = id(self)
+        shared_kwargs = {} if shared_kwargs is None else shared_kwargs
+        if backend == 'thread':
+            self.pool_ = ThreadPool(
+                workers, initializer=_init_worker, initargs=(self.id_, shared_kwargs, initializer, initargs, False))
+        else:
+            ctx = mp.get_context(context)
+            if ctx.get_start_method() == 'fork':
+                __POOL_KWARGS__[self.id_] = shared_kwargs
+                shared_kwargs = None
+                # Forked workers must report shared memory they attach to resource tracker of parent,
+                # otherwise each of them starts its own one, that warns about blocks parent destroyed already
+                resource_tracker.ensure_running()
+            self.pool_ = ctx.Pool(
+                workers, initializer=_init_worker, initargs=(self.id_, shared_kwargs, initializer, initargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def close(self):
+        """Wait for all workers to complete their tasks and stop them"""
+        self.pool_.close()
+        self.pool_.join()
+        __POOL_KWARGS__.pop(self.id_, None)
+
+    def terminate(self):
+        """Stop all workers immediately"""
+        self.pool_.terminate()
+        self.pool_.join()
+        __POOL_KWARGS__.pop(self.id_, None)
+
+    def map_reduce(
+            self, inputs: Iterable, map_func: Callable, reduce_func: Callable=None, reduce_init=None,
+            progress_bar=tqdm, chunk_size: int=None, ordered: bool=True, associative: bool=False,
+            shared_memory: bool=False, costs: Union[Sequence[float], Callable]=None, retries: int=0,
+            timeout: float=None, checkpoint_dir: Union[str, Path]=None, metrics: TaskMetrics=None,
+            **map_func_kwargs) -> "output of reduce_func or list of map_func outputs":
+        """Same as map_reduce() function, but with workers of this pool"""
+        if timeout is not None and self.backend == 'thread':
+            raise ValueError('Timeout is not supported by thread backend!')
+        if retries or timeout is not None:
+            map_func = partial(_retry, map_func=map_func, retries=retries, timeout=timeout)
+        kwargs = dict(
+            pool=self.pool_, workers=self.workers, inputs=inputs, map_func=map_func, reduce_func=reduce_func,
+            reduce_init=reduce_init, progress_bar=progress_bar,
+            shared_memory=shared_memory and self.backend == 'process',
+            checkpoint_dir=None if checkpoint_dir is None else plain_path(checkpoint_dir), metrics=metrics)
+        if chunk_size is None:
+            chunk_size = _default_chunk_size(inputs, workers=self.workers)
+        if costs is not None:
+            return _map_reduce_balanced(**kwargs, chunk_size=chunk_size, costs=costs, **map_func_kwargs)
+        if associative and reduce_func is not None:
+            return _map_reduce_tree(**kwargs, chunk_size=chunk_size, **map_func_kwargs)
+        return _map_reduce_stream(**kwargs, chunk_size=chunk_size, ordered=ordered, **map_func_kwargs)
+
+
+def map_reduce(
+        inputs: Iterable, workers: int, map_func: Callable, reduce_func: Callable=None, reduce_init=None,
+        progress_bar=tqdm, chunk_size: int=None, ordered: bool=True, associative: bool=False,
+        shared_memory: bool=False, costs: Union[Sequence[float], Callable]=None, backend: str='process',
+        retries: int=0, timeout: float=None, checkpoint_dir: Union[str, Path]=None, metrics: TaskMetrics=None,
+        **map_func_kwargs) -> "output of reduce_func or list of map_func outputs":
+    """
+    Standard map-reduce routine to parallelize inputs between workers.
+    Inputs may be any iterable: they are fed to workers in chunks of chunk_size and outputs are reduced
+    as soon as they arrive, so only about 2 * workers chunks are held in memory at once.
+    Progress bar is updated by parent with each delivered chunk and reports throughput and utilization of workers.
+    With ordered=False outputs are reduced in order of completion instead of order of inputs.
+    With associative=True outputs of each chunk are reduced inside of workers and partial outputs are combined
+    as a tree with reduce_func(later_output, earlier_output), reduce_func must accept its own outputs for that.
+    With shared_memory=True numeric arrays, Series and DataFrame columns among inputs are passed to workers
+    through shared memory as read-only views instead of being pickled, see share().
+    With costs, either list of estimates per input or function of map_func arguments, inputs are split into chunks
+    of equal total cost and the most costly ones are mapped first, so that skewed inputs do not leave one worker behind.
+    Backend is one of "process,thread,asyncio": threads suit I/O-bound map_func better than processes,
+    with asyncio map_func must be a coroutine function and workers is a number of coroutines awaited at once.
+    Each map_func call is repeated at most retries times if it fails or does not complete in timeout seconds,
+    timeout relies on SIGALRM, so it does not interrupt blocking C code and is not supported by thread backend,
+    nor with workers=1 outside of main thread.
+    With checkpoint_dir outputs of each chunk are stored into this directory, so restarted job skips chunks
+    mapped before, directory must be unique per job and chunks must be the same, so pass chunk_size explicitly.
+    With metrics, see TaskMetrics, latency, serialization and compute time of each chunk are recorded into it.
+    Use WorkerPool to call map_reduce repeatedly without respawning workers.
+    """
+    _check_backend(backend)
+    if backend == 'asyncio':
+        if checkpoint_dir is not None:
+            raise ValueError('Checkpoints are not supported by asyncio backend!')
+        if metrics is not None:
+            raise ValueError('Metrics are not supported by asyncio backend!')
+        return _map_reduce_async(
+            workers=workers, inputs=inputs, map_func=map_func, reduce_func=reduce_func, reduce_init=reduce_init,
+            progress_bar=progress_bar, ordered=ordered, retries=retries, timeout=timeout, **map_func_kwargs)
+    if workers > 1:
+        with WorkerPool(workers, backend=backend) as pool:
+            return pool.map_reduce(
+                inputs=inputs, map_func=map_func, reduce_func=reduce_func, reduce_init=reduce_init,
+                progress_bar=progress_bar, chunk_size=chunk_size, ordered=ordered, associative=associative,
+                shared_memory=shared_memory, costs=costs, retries=retries, timeout=timeout,
+                checkpoint_dir=checkpoint_dir, metrics=metrics, **map_func_kwargs)
+    if timeout is not None and threading.current_thread() is not threading.main_thread():
+        raise ValueError('Timeout with workers=1 is supported only in main thread!')
+    if retries or timeout is not None:
+        map_func = partial(_retry, map_func=map_func, retries=retries, timeout=timeout)
+    return _map_reduce_stream(
+        pool=None, workers=workers, inputs=inputs, map_func=map_func, reduce_func=reduce_func, reduce_init=reduce_init,
+        progress_bar=progress_bar, chunk_size=chunk_size or 1, ordered=ordered, shared_memory=False,
+        checkpoint_dir=None if checkpoint_dir is None else plain_path(checkpoint_dir), metrics=metrics,
+        **map_func_kwargs)
@@ -1,10 +1,136 @@
+from typing import *
+
 import numpy as np
 
+from pysimple.parallel import map_reduce
+
+# Statistics that are computed from weighted sums of observations, so that observations are resampled in chunks
+MOMENT_STATISTICS = ('mean', 'sum', 'var', 'std')
+STATISTIC_FUNCS = dict(mean=np.mean, sum=np.sum, var=np.var, std=np.std)
+BOOTSTRAP_METHODS = ('multinomial', 'poisson')
+
+
+def _moments_chunk(
+        x: np.ndarray, weights: Optional[np.ndarray], totals: Optional[np.ndarray], seed: np.random.SeedSequence,
+        samples: int, method: str) -> np.ndarray:
+    """Sums of weights, values and squared values of resampled chunk of observations, shape (3, samples)"""
+    rng = np.random.default_rng(seed)
+    if method == 'poisson':
+        counts = rng.poisson(1., size=(samples, len(x)))
+    else:
+        # Chunk of each sample is resampled as many times as chunk was drawn for sample
+        counts = rng.multinomial(totals, np.full(len(x), 1 / len(x)))
+    counts = counts if weights is None else counts * weights
+    return np.stack([counts.sum(axis=1), counts @ x, counts @ x ** 2])
+
+
+def _statistics_chunk(
+        x: np.ndarray, seed: Optional[np.random.SeedSequence], samples: int,
+        statistics: Dict[str, Callable]) -> Dict[str, np.ndarray]:
+    if seed is None:
+        # Chunks drawn one after another from global random state are the same as one array drawn at once
+        x_resampled = np.random.choice(x, size=(samples, len(x)))
+    else:
+        x_resampled = x[np.random.default_rng(seed).integers(len(x), size=(samples, len(x)))]
+    return {name: func(x_resampled, axis=1) for name, func in statistics.items()}
+
+
+def _concat(outp: Dict[str, np.ndarray], reduced_outp: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    if reduced_outp is None:
+        return outp
+    return {name: np.concatenate([reduced_outp[name], values]) for name, values in outp.items()}
+
+
+def _bootstrap_moments(
+        x: np.ndarray, weights: Optional[np.ndarray], samples: int, method: str, seed_seq: np.random.SeedSequence,
+        chunk_values: int, workers: int, statistics: List[str]) -> Tuple[Dict[str, float], Dict[str, np.ndarray]]:
+    n = len(x)
+    chunk_size = max(1, chunk_values // samples)
+    x_weights = np.ones(n) if weights is None else weights
+    total_weight = x_weights.sum()
+    x_mean = x_weights @ x / total_weight
+    # Values are centered for numerical stability of variance
+    x = x - x_mean
+    starts = list(range(0, n, chunk_size))
+    totals_seed, *chunk_seeds = seed_seq.spawn(len(starts) + 1)
+    totals = None
+    if method == 'multinomial':
+        chunk_sizes = np.diff(starts + [n])
+        totals = np.random.default_rng(totals_seed).multinomial(n, chunk_sizes / n, size=samples)
+    inputs = [
+        (x[start:start + chunk_size], None if weights is None else weights[start:start + chunk_size],
+         None if totals is None else totals[:, i], chunk_seeds[i])
+        for i, start in enumerate(starts)]
+    sum_weights, sum_x, sum_x2 = map_reduce(
+        inputs=inputs, workers=workers, map_func=_moments_chunk, reduce_func=np.add, reduce_init=0,
+        progress_bar=None, samples=samples, method=method)
+
+    mean = x_mean + sum_x / sum_weights
+    var = sum_x2 / sum_weights - (sum_x / sum_weights) ** 2
+    resampled = dict(mean=mean, sum=sum_x + sum_weights * x_mean, var=var, std=np.sqrt(var))
+    x_var = x_weights @ x ** 2 / total_weight
+    actual = dict(mean=x_mean, sum=total_weight * x_mean, var=x_var, std=np.sqrt(x_var))
+    return {name: actual[name] for name in statistics}, {name: resampled[name] for name in statistics}
+
+
+def _bootstrap_statistics(
+        x: np.ndarray, samples: int, seed_seq: Optional[np.random.SeedSequence], chunk_values: int, workers: int,
+        statistics: Dict[str, Callable]) -> Tuple[Dict[str, float], Dict[str, np.ndarray]]:
+    samples_per_chunk = max(1, chunk_values // len(x))
+    chunk_samples = [min(samples_per_chunk, samples - i) for i in range(0, samples, samples_per_chunk)]
+    seeds = [None] * len(chunk_samples) if seed_seq is None else seed_seq.spawn(len(chunk_samples))
+    inputs = [(x, seed, n) for seed, n in zip(seeds, chunk_samples)]
+    resampled = map_reduce(
+        inputs=inputs, workers=workers, map_func=_statistics_chunk, reduce_func=_concat, progress_bar=None,
+        statistics=statistics)
+    actual = {name: func(x) for name, func in statistics.items()}
+    return actual, resampled
+
+
+def bootstrap(
+        x: np.array, samples: int=100, percent: int=10, statistics: Sequence[Union[str, Callable]]=None,
+        method: str='multinomial', weights: np.array=None, seed: Union[int, np.random.Generator]=None,
+        chunk_values: int=2 ** 24, workers: int=1) -> Union[Tuple[float, float, float], Dict[str, Tuple]]:
+    """
+    Bootstrap values, return actual mean and (percent / 2, 100 - percent / 2) percentiles.
+    With statistics, e.g. ["mean", "std", np.median], return such triple for each of them by its name.
+    Statistics "mean,sum,var,std" are computed from weighted sums over chunks of observations resampled for all
+    samples at once, with method="poisson" each observation is drawn Poisson(1) times per sample instead of
+    multinomial resampling, with weights observations are weighted. Other statistics are functions of array
+    with axis argument, applied to arrays resampled for chunks of samples. Chunk holds at most chunk_values
+    resampled values, chunks are bootstrapped in parallel by workers, so results depend on seed and chunk_values,
+    but not on workers.
+    Default multinomial bootstrap without seed in one worker resamples values from global numpy random state
+    as np.random.choice() does, otherwise missing seed is drawn from it.
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f'Unknown method={method}, must be one of {",".join(BOOTSTRAP_METHODS)}!')
+    use_global_state = seed is None and method == 'multinomial' and weights is None and workers == 1
+    if seed is None:
+        seed = np.random.randint(2 ** 32) if not use_global_state else None
+    elif isinstance(seed, np.random.Generator):
+        seed = int(seed.integers(2 ** 63))
+    seed_seq = None if use_global_state else np.random.SeedSequence(seed)
+    x = np.asarray(x, dtype=float)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+
+    only_mean = statistics is None
+    statistics = ['mean'] if only_mean else statistics
+    names = [statistic if isinstance(statistic, str) else statistic.__name__ for statistic in statistics]
+    if not use_global_state and all(statistic in MOMENT_STATISTICS for statistic in statistics):
+        actual, resampled = _bootstrap_moments(
+            x=x, weights=weights, samples=samples, method=method, seed_seq=seed_seq, chunk_values=chunk_values,
+            workers=workers, statistics=names)
+    else:
+        if method != 'multinomial' or weights is not None:
+            raise ValueError(f'Only statistics {",".join(MOMENT_STATISTICS)} support weights and poisson method!')
+        funcs = {
+            name: STATISTIC_FUNCS[statistic] if isinstance(statistic, str) else statistic
+            for name, statistic in zip(names, statistics)}
+        actual, resampled = _bootstrap_statistics(
+            x=x, samples=samples, seed_seq=seed_seq, chunk_values=chunk_values, workers=workers, statistics=funcs)
 
-def bootstrap(x: np.array, samples: int=100, percent: int=10) -> (float, float, float):
-    """Bootstrap values, return actual mean and (percent / 2, 100 - percent / 2) percentiles"""
     percentiles = (percent / 2, 100 - percent / 2)
-    x_mean = np.mean(x)
-    x_bootstrapped = np.mean(np.random.choice(x, size=(samples, len(x))), axis=1)
-    x_percentile1, x_percentile2 = np.percentile(x_bootstrapped, percentiles)
-    return x_mean, x_percentile1, x_percentile2
+    intervals = {name: (actual[name], *np.percentile(resampled[name], percentiles)) for name in names}
+    return intervals['mean'] if only_mean else intervals
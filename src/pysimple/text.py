@@ -1,6 +1,62 @@
+import unicodedata
+from functools import partial
+from typing import *
+
+import numpy as np
 import pandas as pd
 
+from pysimple.utils import compute_hash64
+
+
+def _flatten(text: str) -> str:
+    """Strip text and replace whitespace characters in it with single spaces"""
+    return ' '.join(text.split())
+
+
+# Steps of normalize_text() by name, step is function of text
+TEXT_STEPS = dict(
+    flatten=_flatten, lower=str.lower, nfc=partial(unicodedata.normalize, 'NFC'),
+    nfkc=partial(unicodedata.normalize, 'NFKC'))
+
+
+def _normalize_chunk(texts: np.ndarray, steps: List[Callable[[str], str]], hash64: bool) -> Union[List, np.ndarray]:
+    """Apply all steps to each text in one pass"""
+    normalized = []
+    for text in texts:
+        text = str(text)
+        for step in steps:
+            text = step(text)
+        normalized.append(text)
+    return compute_hash64(np.array(normalized, dtype=object)) if hash64 else normalized
+
+
+def normalize_text(
+        t: pd.Series, steps: Sequence[Union[str, Callable[[str], str]]]=('flatten',), workers: int=1,
+        chunk_size: int=1_000_000, dtype: str=None) -> pd.Series:
+    """
+    Normalize text column with sequence of steps applied to each text in one pass, without Series per step.
+    Step is either function of text or one of "flatten,lower,nfc,nfkc", last step may be "hash" to return
+    64-bit signed integers of normalized texts, see utils.compute_hash64().
+    Chunks of chunk_size texts are normalized in parallel by workers, that pays off only for steps costlier than
+    pickling of texts, e.g. custom tokenizers, built-in steps run faster in one process.
+    Dtype of output is inferred unless passed, e.g. "string[pyarrow]".
+    """
+    steps = list(steps)
+    hash64 = bool(steps) and steps[-1] == 'hash'
+    steps = [TEXT_STEPS[step] if isinstance(step, str) else step for step in (steps[:-1] if hash64 else steps)]
+    texts = t.to_numpy(dtype=object)
+    if workers > 1 and len(texts) > chunk_size:
+        from pysimple.parallel import map_reduce
+
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        outputs = map_reduce(
+            inputs=chunks, workers=workers, map_func=_normalize_chunk, progress_bar=None, steps=steps, hash64=hash64)
+        normalized = np.concatenate(outputs) if hash64 else [text for output in outputs for text in output]
+    else:
+        normalized = _normalize_chunk(texts, steps=steps, hash64=hash64)
+    return pd.Series(normalized, index=t.index, name=t.name, dtype=dtype)
+
 
 def flatten_text(t: pd.Series) -> pd.Series:
     """Replace whitespace characters in text column with spaces"""
-    return t.astype(str).str.strip().str.rstrip().str.replace(r'\s+', ' ')
+    return normalize_text(t, steps=('flatten',))
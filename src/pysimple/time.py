@@ -1,4 +1,21 @@
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import tracemalloc
+from array import array
+from collections import defaultdict
+from contextlib import ContextDecorator, contextmanager
+from logging import Logger
+from pathlib import Path
 from time import perf_counter
+from typing import *
+
+import numpy as np
+
+from pysimple.io import ensure_filedir, to_json
+from pysimple.logging import silent_logger
 
 
 class Stopwatch:
@@ -10,16 +27,133 @@ class Stopwatch:
 
     def __enter__(self):
         self.started_at_ = perf_counter()
+        self.stopped_at_ = None
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.started_at_ = perf_counter()
+        self.stopped_at_ = perf_counter()
 
-    def elapsed_ms(self) -> int:
-        """How much time passed in milliseconds since stopwatch started"""
+    def elapsed(self) -> float:
+        """How much time passed in seconds since stopwatch started till it stopped or till now"""
         if not self.started_at_:
             raise ValueError('Stopwatch was not started!')
-        if not self.stopped_at_:
-            # Stop now, may be stopped later again
-            self.stopped_at_ = perf_counter()
-        return int(1000 * (self.stopped_at_ - self.started_at_))
+        stopped_at = perf_counter() if self.stopped_at_ is None else self.stopped_at_
+        return stopped_at - self.started_at_
+
+    def elapsed_ms(self) -> int:
+        """How much time passed in milliseconds since stopwatch started till it stopped or till now"""
+        return int(1000 * self.elapsed())
+
+
+class Timer(ContextDecorator):
+    """Named timer of Timings, usable both as context manager and as decorator"""
+
+    def __init__(self, timings: "Timings", name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.timings._start(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.timings._stop()
+
+
+class Timings:
+    """
+    Durations of named timers aggregated per name.
+    Timer started inside of another timer of the same thread is named by path of names, e.g. "load/parse".
+    """
+
+    def __init__(self):
+        self.durations_: Dict[str, array] = defaultdict(lambda: array('d'))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Tuple[str, float]]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _start(self, name: str):
+        stack = self._stack()
+        path = f'{stack[-1][0]}/{name}' if stack else name
+        stack.append((path, perf_counter()))
+
+    def _stop(self):
+        path, started_at = self._stack().pop()
+        self.add(path, seconds=perf_counter() - started_at)
+
+    def timer(self, name: str) -> Timer:
+        return Timer(timings=self, name=name)
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.durations_[name].append(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Count, total, median, 95th percentile and max of durations in seconds per name"""
+        stats = {}
+        with self._lock:
+            for name, durations in sorted(self.durations_.items()):
+                durations = np.frombuffer(durations, dtype=np.float64)
+                p50, p95 = np.percentile(durations, (50, 95))
+                stats[name] = dict(
+                    count=len(durations), total=durations.sum(), p50=p50, p95=p95, max=durations.max())
+        return stats
+
+    def log(self, logger: Logger, level: int=logging.INFO):
+        if not logger.isEnabledFor(level):
+            return
+        for name, stats in self.stats().items():
+            logger.log(level, f'{name}: ' + ', '.join(f'{stat}={value:.6g}' for stat, value in stats.items()))
+
+    def dump_json(self, filepath: Union[str, Path], logger: Logger=silent_logger()):
+        to_json(filepath, data=self.stats(), logger=logger)
+
+    def reset(self):
+        with self._lock:
+            self.durations_.clear()
+
+
+# Timings of timer() by default
+TIMINGS = Timings()
+
+
+def timer(name: str, timings: Timings=TIMINGS) -> Timer:
+    """Named timer to measure block of code or function, e.g. with timer('load'): ... or @timer('load')"""
+    return timings.timer(name)
+
+
+@contextmanager
+def profile(
+        logger: Logger=silent_logger(), filepath: Union[str, Path]=None, sort: str='cumulative', top: int=20,
+        memory: bool=False) -> Iterator[cProfile.Profile]:
+    """
+    Profile block of code or function with cProfile and log top functions sorted by sort,
+    stats are dumped into filepath to be inspected with pstats or snakeviz later.
+    With memory=True allocations are traced with tracemalloc as well, top lines by allocated size are logged.
+    """
+    profiler = cProfile.Profile()
+    trace_memory = memory and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if logger.isEnabledFor(logging.INFO):
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(top)
+            logger.info('Profile:\n%s', stream.getvalue())
+        if filepath is not None:
+            profiler.dump_stats(ensure_filedir(filepath))
+        if memory and logger.isEnabledFor(logging.INFO):
+            _, peak = tracemalloc.get_traced_memory()
+            top_lines = tracemalloc.take_snapshot().statistics('lineno')[:top]
+            top_lines = '\n'.join(map(str, top_lines))
+            logger.info('Peak traced memory %.1f MiB, top allocations:\n%s', peak / 2 ** 20, top_lines)
+        if trace_memory:
+            tracemalloc.stop()
@@ -17,8 +17,11 @@ def flatten_iter(x: Iterator[Iterator]) -> Iterator:
 
 
 def df2dict(data: pd.DataFrame) -> List[Dict[str, Any]]:
-    """Convert pandas DataFrame rows into list of records."""
-    return list(data.T.to_dict().values())
+    """Convert pandas DataFrame rows into list of records, records are zipped from columns without transpose."""
+    if data.shape[1] == 0:
+        return [{} for _ in range(len(data))]
+    columns = [data.iloc[:, i].tolist() for i in range(data.shape[1])]
+    return [dict(zip(data.columns, row)) for row in zip(*columns)]
 
 
 def split_list(items: List, splits: List[int]=None, n_splits: int=None, split_size: int=None) -> Iterator[List]:
@@ -45,70 +48,135 @@ def split_list(items: List, splits: List[int]=None, n_splits: int=None, split_si
 def data2batches(
         data: pd.DataFrame, n_batches: int=None, batch_size: int=None,
         orient: str=None) -> Iterator[Union[List[Dict[str, Any]], pd.DataFrame]]:
-    """Split data table into batches of tables or records"""
-    if batch_size is None:
-        batch_size = np.ceil(len(data) / n_batches)
+    """Split data table into batches of tables or records, batches of tables are slices of data without copy"""
+    # Empty data yields no batches, batch size must be positive integer all the same
+    batch_size = int(np.ceil(len(data) / n_batches)) if batch_size is None else int(batch_size)
+    batch_size = max(1, batch_size)
     if orient is None:
-        bins = np.arange(len(data)) // batch_size
-        for _, batch in data.groupby(bins):
-            yield batch
+        for start in range(0, len(data), batch_size):
+            yield data.iloc[start:start + batch_size]
     else:
         if orient == 'records':
-            data = df2dict(data=data)
-            n_splits = int(np.ceil(len(data) / batch_size))
-            yield from split_list(items=data, n_splits=n_splits)
+            # Records are converted lazily batch by batch
+            for start in range(0, len(data), batch_size):
+                yield df2dict(data=data.iloc[start:start + batch_size])
         else:
             raise ValueError(f'Invalid value of orient = {orient}, must be one of "records,None"!')
 
 
-def compute_hash64(text: Union[str, pd.Series]) -> Union[int, pd.Series]:
-    """Compute consistent 64-bit signed integer for text or texts"""
+def _hash64_array(texts: Sequence[str]) -> np.ndarray:
+    """Compute 64-bit signed integers for texts straight into uint64 buffer, without pandas call per text"""
+    return np.fromiter(map(CityHash64, texts), dtype=np.uint64, count=len(texts)).view(np.int64)
+
+
+def compute_hash64(text: Union[str, pd.Series, np.ndarray, "pyarrow.Array"]) -> Union[int, pd.Series, np.ndarray]:
+    """
+    Compute consistent 64-bit signed integer for text or texts.
+    Series, arrays and pyarrow string arrays are hashed at once in one process,
+    since hashing text is cheaper than pickling it to another one.
+    """
     if isinstance(text, str):
-        text_hash = c_long(CityHash64(text)).value
-    elif isinstance(text, pd.Series):
-        text_hash = text.apply(CityHash64)
-        text_hash = text_hash.astype(np.int64) if text_hash.dtype == np.uint64 else text_hash
-        if text_hash.dtype != np.int64:
-            raise ValueError(f'Computed hashes must be of type np.int64 instead of {text_hash.dtype}!')
+        return c_long(CityHash64(text)).value
+    if isinstance(text, pd.Series):
+        texts = text.to_numpy(dtype=object)
+    elif isinstance(text, np.ndarray):
+        texts = text
+    elif type(text).__module__.startswith('pyarrow'):
+        texts = text.to_pylist()
     else:
-        raise TypeError(f"Input must of type str or Series, but got {type(text)}!")
+        raise TypeError(f"Input must of type str, Series, ndarray or pyarrow Array, but got {type(text)}!")
+
+    text_hash = _hash64_array(texts)
+    if isinstance(text, pd.Series):
+        text_hash = pd.Series(text_hash, index=text.index, name=text.name)
     return text_hash
 
 
 DT_TYPE = Union[dt.date, dt.datetime]
+DT_ARRAY_TYPE = Union[np.ndarray, pd.Series]
 
+DELTA_SECONDS = dict(day=60 * 60 * 24, hour=60 * 60, min=60, sec=1)
 
-def diff_between_dates(from_date: DT_TYPE, till_date: DT_TYPE, delta: str) -> int:
-    """Count delta between dates, both from_date and till_date must be of the same type"""
+
+def _is_dt_array(*dates: Union[DT_TYPE, DT_ARRAY_TYPE]) -> bool:
+    return any(isinstance(date, (np.ndarray, pd.Series, pd.Index)) for date in dates)
+
+
+def diff_between_dates(
+        from_date: Union[DT_TYPE, DT_ARRAY_TYPE], till_date: Union[DT_TYPE, DT_ARRAY_TYPE],
+        delta: str) -> Union[int, DT_ARRAY_TYPE]:
+    """
+    Count delta between dates, both from_date and till_date must be of the same type.
+    Dates may be datetime64 arrays or Series, then deltas are counted for all pairs of dates at once.
+    """
+    if delta not in DELTA_SECONDS:
+        raise ValueError(f'Unknown delta={delta}, must be one of day,hour,min,sec!')
+    period = DELTA_SECONDS[delta]
     diff = till_date - from_date
+    if _is_dt_array(diff):
+        # Floor division of whole seconds by period is the same as floor division of time by period
+        return diff // np.timedelta64(period, 's')
     seconds = diff.days * 24 * 60 * 60 + diff.seconds
-    if delta == 'day':
-        period = 60 * 60 * 24
-    elif delta == 'hour':
-        period = 60 * 60
-    elif delta == 'min':
-        period = 60
-    elif delta == 'sec':
-        period = 1
-    else:
-        raise ValueError(f'Unknown delta={delta}, must be one of day,hour,min,sec!')
     return seconds // period
 
 
-def get_dates_between(start_date: DT_TYPE, end_date: DT_TYPE, **delta_args) -> Iterator[DT_TYPE]:
-    """Get list of dates between start and end dates"""
+def _wall_clock(dates: Union[DT_TYPE, DT_ARRAY_TYPE]) -> Tuple[np.ndarray, Optional[dt.tzinfo]]:
+    """Local time of dates as datetime64 array along with their timezone, so that steps follow wall clock"""
+    dates = pd.to_datetime(dates)
+    values = dates.dt if isinstance(dates, pd.Series) else dates
+    if values.tz is None:
+        return np.asarray(dates, dtype='datetime64[ns]'), None
+    return np.asarray(values.tz_localize(None), dtype='datetime64[ns]'), values.tz
+
+
+def _get_dates_between_arrays(
+        start_dates: Union[DT_TYPE, DT_ARRAY_TYPE], end_dates: Union[DT_TYPE, DT_ARRAY_TYPE],
+        step: pd.Timedelta) -> pd.Series:
+    index = next((dates.index for dates in (start_dates, end_dates) if isinstance(dates, pd.Series)), None)
+    (start_dates, tz), (end_dates, end_tz) = _wall_clock(start_dates), _wall_clock(end_dates)
+    if str(tz) != str(end_tz):
+        raise ValueError(f'Start and end dates must be in the same timezone, but got {tz} and {end_tz}!')
+    start_dates, end_dates = np.broadcast_arrays(start_dates, end_dates)
+    if index is None:
+        index = pd.RangeIndex(len(start_dates))
+    step = step.to_timedelta64()
+    counts = np.maximum(-((start_dates - end_dates) // step), 0)
+    # Position of each date in its range
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    dates = pd.Series(np.repeat(start_dates, counts) + offsets * step, index=index.repeat(counts))
+    return dates if tz is None else dates.dt.tz_localize(tz)
+
+
+def get_dates_between(
+        start_date: Union[DT_TYPE, DT_ARRAY_TYPE], end_date: Union[DT_TYPE, DT_ARRAY_TYPE],
+        **delta_args) -> Union[Iterator[DT_TYPE], pd.Series]:
+    """
+    Get list of dates between start and end dates.
+    Dates may be datetime64 arrays or Series, then all ranges are computed at once
+    and returned as one Series of dates, indexed by index of rows in which they start like with explode().
+    Timezone-aware dates are stepped by local time and keep their timezone, which must be the same for all dates.
+    """
     if not delta_args:
         raise ValueError('Must pass one of datetime deltas: days,hours,minutes,seconds,...!')
+    if _is_dt_array(start_date, end_date):
+        return _get_dates_between_arrays(start_date, end_date, step=pd.Timedelta(**delta_args))
+    return _iter_dates_between(start_date, end_date, **delta_args)
+
+
+def _iter_dates_between(start_date: DT_TYPE, end_date: DT_TYPE, **delta_args) -> Iterator[DT_TYPE]:
     curr_date = start_date
     while curr_date < end_date:
         yield curr_date
         curr_date += dt.timedelta(**delta_args)
 
 
-def get_checksum(*, text: str=None, filepath: Path=None, encoding: str='UTF-8', errors: str='strict') -> int:
-    """Calculate checksum of file or text"""
+def get_checksum(
+        *, text: str=None, filepath: Path=None, data: bytes=None, encoding: str='UTF-8', errors: str='strict') -> str:
+    """Calculate checksum of file, text or bytes"""
     if filepath is not None:
         text = plain_path(filepath).read_bytes()
+    elif data is not None:
+        text = data
     else:
         text = bytes(text, encoding=encoding, errors=errors)
     return hashlib.md5(text).hexdigest()
@@ -125,13 +193,22 @@ def get_tmp_col(df: pd.DataFrame) -> str:
 
 
 def split_into_batches(data: pd.DataFrame, split_cols: List[str], n_batches: int) -> Iterator[pd.DataFrame]:
-    """Split data table into batches with non-overlapping column values"""
-    ind_col = get_tmp_col(df=data)
-    data[ind_col] = data.groupby(split_cols).ngroup()
-    group_inds = data[ind_col].unique().tolist()
-    group_inds = split_list(items=group_inds, n_splits=n_batches)
-    for inds in group_inds:
-        yield data[data[ind_col].isin(inds)].drop(columns=[ind_col])
+    """
+    Split data table into batches with non-overlapping column values.
+    Rows are assigned to batches in one pass by their group number, data itself is not modified.
+    """
+    group_inds = data.groupby(split_cols, dropna=False).ngroup().to_numpy()
+    n_groups = group_inds.max() + 1 if len(group_inds) else 0
+    if n_groups == 0:
+        yield data
+        return
+    # Consecutive groups are assigned to the same batch, as split_list() does
+    split_size = int(np.ceil(n_groups / n_batches))
+    batch_inds = group_inds // split_size
+    row_order = np.argsort(batch_inds, kind='stable')
+    bounds = np.searchsorted(batch_inds[row_order], np.arange(batch_inds[row_order[-1]] + 2))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield data.iloc[row_order[start:end]]
 
 
 def cumsplit(items: List[Union[int, float]], n_splits: int) -> List[int]:
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from pysimple.cache import memoize, ResultCache
+
+
+class MemoizeTestCase(unittest.TestCase):
+    """Test cache.memoize() decorator"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def square(self, x: int, power: int=2) -> int:
+        self.calls.append(x)
+        return x ** power
+
+    def test_output_is_cached(self):
+        """Test if memoize() computes result only once per arguments"""
+        square = memoize(self.tmp_dir.name)(self.square)
+        self.assertEqual(4, square(2))
+        self.assertEqual(4, square(2))
+        self.assertEqual(8, square(2, power=3))
+        self.assertEqual([2, 2], self.calls)
+
+    def test_output_is_cached_on_disk(self):
+        """Test if memoize() loads result computed by another run from disk"""
+        memoize(self.tmp_dir.name, compress=True)(self.square)(3)
+        square = memoize(self.tmp_dir.name, compress=True)(self.square)
+        self.assertEqual(9, square(3))
+        self.assertEqual([3], self.calls)
+
+    def test_max_age(self):
+        """Test if memoize() recomputes results older than max_age"""
+        square = memoize(self.tmp_dir.name, max_memory_bytes=0, max_age=60)(self.square)
+        square(2)
+        for filepath in Path(self.tmp_dir.name).iterdir():
+            os.utime(filepath, (0, 0))
+        square(2)
+        self.assertEqual([2, 2], self.calls)
+
+    def test_max_age_in_memory(self):
+        """Test if memoize() recomputes results older than max_age that are cached in memory"""
+        square = memoize(self.tmp_dir.name, max_age=0.2)(self.square)
+        square(2)
+        square(2)
+        time.sleep(0.3)
+        square(2)
+        self.assertEqual([2, 2], self.calls)
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    """Test cache.ResultCache class"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_max_disk_bytes(self):
+        """Test if ResultCache keeps only the most recently used results on disk"""
+        cache = ResultCache(self.tmp_dir.name)
+        cache.put('a', 'a' * 1000)
+        nbytes = cache.filepath('a').stat().st_size
+        cache.max_disk_bytes = 2 * nbytes
+        for i, key in enumerate('bc'):
+            os.utime(cache.filepath('a'), (i, i))
+            cache.put(key, key * 1000)
+        self.assertEqual(['b.pkl', 'c.pkl'], sorted(os.listdir(self.tmp_dir.name)))
+        self.assertEqual(['b', 'c'], list(cache.memory_))
+        self.assertEqual((False, None), cache.get('a'))
+
+    def test_truncated_result(self):
+        """Test if ResultCache treats result that can not be loaded as missing and removes its file"""
+        cache = ResultCache(self.tmp_dir.name, max_memory_bytes=0)
+        cache.put('a', 'a' * 1000)
+        filepath = cache.filepath('a')
+        filepath.write_bytes(filepath.read_bytes()[:100])
+        self.assertEqual((False, None), cache.get('a'))
+        self.assertFalse(filepath.exists())
+        cache.put('a', 'a' * 1000)
+        self.assertEqual((True, 'a' * 1000), cache.get('a'))
+
+    def test_max_memory_bytes(self):
+        """Test if ResultCache keeps only the most recently used results in memory"""
+        cache = ResultCache(self.tmp_dir.name, max_memory_bytes=2500)
+        for key in 'abc':
+            cache.put(key, key * 1000)
+        self.assertEqual(['b', 'c'], list(cache.memory_))
+
+
+if __name__ == '__main__':
+    unittest.main()
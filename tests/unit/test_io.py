@@ -0,0 +1,311 @@
+import itertools
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pysimple.io import (
+    from_tsv, iter_tsv, to_tsv, TsvWriter, compact_dtypes, dump_pickle, load_pickle, read_lines, write_lines,
+    read_line_batches, count_lines, line_shards, map_lines)
+
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import zstandard
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+try:
+    import lz4
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+
+class PickleTestCase(unittest.TestCase):
+    """Test io.dump_pickle() and io.load_pickle() functions"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.obj = dict(array=np.arange(1000), text='abc' * 100)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_dumped_and_loaded(self, filename: str, **kwargs):
+        filepath = Path(self.tmp_dir.name) / filename
+        dump_pickle(filepath, self.obj, **kwargs)
+        actual = load_pickle(filepath)
+        np.testing.assert_array_equal(self.obj['array'], actual['array'])
+        self.assertEqual(self.obj['text'], actual['text'])
+
+    def test_output_is_valid(self):
+        """Test if load_pickle() loads object dumped by dump_pickle() for standard extensions"""
+        for filename in ('obj.pkl', 'obj.pkl.gz', 'obj.pkl.bz2', 'obj.pkl.xz'):
+            self.assert_dumped_and_loaded(filename)
+        self.assert_dumped_and_loaded('fast.pkl.gz', compress_level=0)
+        self.assert_dumped_and_loaded('fast.pkl.xz', compress_level=0)
+
+    @unittest.skipUnless(HAS_ZSTANDARD, 'zstandard is not installed')
+    def test_zstd(self):
+        """Test if load_pickle() loads object dumped by dump_pickle() with zstd"""
+        self.assert_dumped_and_loaded('obj.pkl.zst')
+        self.assert_dumped_and_loaded('fast.pkl.zst', compress_level=-5, threads=2)
+
+    @unittest.skipUnless(HAS_LZ4, 'lz4 is not installed')
+    def test_lz4(self):
+        """Test if load_pickle() loads object dumped by dump_pickle() with lz4"""
+        self.assert_dumped_and_loaded('obj.pkl.lz4')
+        self.assert_dumped_and_loaded('small.pkl.lz4', compress_level=9)
+
+    def test_out_of_band(self):
+        """Test if load_pickle() memory-maps buffers dumped by dump_pickle() with out_of_band=True"""
+        self.obj['data'] = pd.DataFrame(dict(a=np.arange(1000), b=np.linspace(0, 1, 1000)))
+        for filename in ('obj.pkl', 'obj.pkl.gz'):
+            filepath = Path(self.tmp_dir.name) / filename
+            dump_pickle(filepath, self.obj, out_of_band=True)
+            self.assertLess(filepath.stat().st_size, self.obj['array'].nbytes)
+            actual = load_pickle(filepath)
+            np.testing.assert_array_equal(self.obj['array'], actual['array'])
+            self.assertFalse(actual['array'].flags.writeable)
+            pd.testing.assert_frame_equal(self.obj['data'], actual['data'])
+            actual = load_pickle(filepath, mmap_mode='c')
+            actual['array'][0] = -1
+            np.testing.assert_array_equal(self.obj['array'], load_pickle(filepath)['array'])
+
+    def test_out_of_band_empty_buffers(self):
+        """Test if load_pickle() loads object dumped out-of-band with empty buffers only"""
+        filepath = Path(self.tmp_dir.name) / 'obj.pkl'
+        dump_pickle(filepath, dict(a=np.empty(0), b=np.empty((0, 3))), out_of_band=True)
+        actual = load_pickle(filepath)
+        self.assertEqual([(0,), (0, 3)], [actual['a'].shape, actual['b'].shape])
+
+    def test_out_of_band_with_dill(self):
+        """Test if dump_pickle() raises error for out-of-band buffers with dill"""
+        with self.assertRaises(ValueError):
+            dump_pickle(Path(self.tmp_dir.name) / 'obj.pkl', self.obj, use_dill=True, out_of_band=True)
+
+    def test_out_of_band_overwritten(self):
+        """Test if dump_pickle() removes buffers of object that was dumped out-of-band before"""
+        filepath = Path(self.tmp_dir.name) / 'obj.pkl'
+        dump_pickle(filepath, self.obj, out_of_band=True)
+        dump_pickle(filepath, 'text')
+        self.assertEqual(['obj.pkl'], os.listdir(self.tmp_dir.name))
+        self.assertEqual('text', load_pickle(filepath))
+
+
+class FromTsvTestCase(unittest.TestCase):
+    """Test io.from_tsv() function"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filepath = Path(self.tmp_dir.name) / 'data.tsv.gz'
+        self.data = pd.DataFrame(dict(
+            int=np.arange(100), half=np.arange(100) / 2, random=np.linspace(0, 1, 100) ** 0.5,
+            category=['a', 'b'] * 50, text=[f'text{i}' for i in range(100)]))
+        to_tsv(self.filepath, data=self.data)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_untyped(self):
+        """Test if from_tsv() loads all values as strings by default"""
+        data = from_tsv(self.filepath)
+        self.assertTrue((data.dtypes == object).all())
+
+    def test_typed(self):
+        """Test if from_tsv() with typed=True loads compact dtypes"""
+        data = from_tsv(self.filepath, typed=True)
+        expected = dict(int='int8', half='float32', random='float64', category='category')
+        self.assertEqual(expected, {col: str(dtype) for col, dtype in data.dtypes.items() if col != 'text'})
+        self.assertNotEqual('category', str(data['text'].dtype))
+        np.testing.assert_array_equal(self.data['random'], data['random'])
+
+    def test_typed_with_na(self):
+        """Test if from_tsv() with typed=True loads missing values as NaN in text and numeric columns"""
+        data = pd.DataFrame(dict(text=['x', 'x', None, 'x'], number=[1.5, np.nan, 2., 3.]))
+        to_tsv(self.filepath, data=data)
+        engines = ('c', 'pyarrow') if HAS_PYARROW else ('c',)
+        for engine, cache_schema in itertools.product(engines, (False, True, True)):
+            actual = from_tsv(self.filepath, typed=True, engine=engine, cache_schema=cache_schema)
+            self.assertEqual(['x'], list(actual['text'].cat.categories))
+            self.assertEqual([False, False, True, False], actual['text'].isna().tolist())
+            self.assertEqual([False, True, False, False], actual['number'].isna().tolist())
+
+    def test_typed_with_dtype(self):
+        """Test if from_tsv() with typed=True keeps passed dtypes and infers the others"""
+        for cache_schema in (False, True, True):
+            data = from_tsv(self.filepath, typed=True, dtype=dict(int='int64'), cache_schema=cache_schema)
+            self.assertEqual('int64', str(data['int'].dtype))
+            self.assertEqual('float32', str(data['half'].dtype))
+        data = from_tsv(self.filepath, typed=True, dtype='float64', usecols=['int', 'half'])
+        self.assertEqual([np.float64, np.float64], list(data.dtypes))
+
+    def test_cache_schema(self):
+        """Test if from_tsv() with cache_schema=True loads the same table with cached schema"""
+        expected = from_tsv(self.filepath, typed=True, cache_schema=True)
+        self.assertTrue(Path(str(self.filepath) + '.schema.json').exists())
+        actual = from_tsv(self.filepath, typed=True, cache_schema=True)
+        pd.testing.assert_frame_equal(expected, actual)
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_cache(self):
+        """Test if from_tsv() with cache=True loads the same table from cache"""
+        for typed in (False, True):
+            expected = from_tsv(self.filepath, typed=typed)
+            actual = from_tsv(self.filepath, typed=typed, cache=True)
+            pd.testing.assert_frame_equal(expected, actual)
+            actual = from_tsv(self.filepath, typed=typed, cache=True)
+            pd.testing.assert_frame_equal(expected, actual)
+            actual = from_tsv(self.filepath, typed=typed, cache=True, usecols=['half', 'text'])
+            pd.testing.assert_frame_equal(expected[['half', 'text']], actual)
+        self.assertEqual(2, len(list(Path(self.tmp_dir.name).glob('*.feather'))))
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_cache_is_transparent(self):
+        """Test if from_tsv() with cache=True loads the same columns and missing values as without cache"""
+        self.data['missing'] = None
+        to_tsv(self.filepath, data=self.data)
+        for typed, usecols in itertools.product((False, True), (None, ['missing', 'text', 'int'])):
+            expected = from_tsv(self.filepath, typed=typed, usecols=usecols)
+            for _ in range(2):
+                actual = from_tsv(self.filepath, typed=typed, usecols=usecols, cache=True)
+                pd.testing.assert_frame_equal(expected, actual)
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_outdated_cache(self):
+        """Test if from_tsv() with cache=True reloads file that is newer than cache"""
+        from_tsv(self.filepath, cache=True)
+        to_tsv(self.filepath, data=self.data.head(10))
+        cache_path, = Path(self.tmp_dir.name).glob('*.feather')
+        os.utime(cache_path, ns=(0, 0))
+        self.assertEqual(10, len(from_tsv(self.filepath, cache=True)))
+
+
+class CompactDtypesTestCase(unittest.TestCase):
+    """Test io.compact_dtypes() function"""
+
+    def test_output_is_valid(self):
+        """Test if compact_dtypes() downcasts numbers without loss of precision"""
+        data = pd.DataFrame(dict(a=[1, 1000, 100_000], b=[0.5, np.nan, 2.], c=[0.1, 0.2, 0.3], d=[True, False, True]))
+        expected = dict(a='int32', b='float32', c='float64', d='bool')
+        self.assertEqual(expected, compact_dtypes(data))
+
+
+class IterTsvTestCase(unittest.TestCase):
+    """Test io.iter_tsv() function"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data = pd.DataFrame(dict(a=[str(i) for i in range(10)], b=['x', np.nan] * 5), dtype=object)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_output_is_valid(self):
+        """Test if iter_tsv() yields chunks of the same table as from_tsv() loads"""
+        for filename in ('data.tsv', 'data.tsv.gz'):
+            filepath = Path(self.tmp_dir.name) / filename
+            to_tsv(filepath, data=self.data)
+            chunks = list(iter_tsv(filepath, chunk_size=3))
+            self.assertEqual([3, 3, 3, 1], [len(chunk) for chunk in chunks])
+            pd.testing.assert_frame_equal(from_tsv(filepath), pd.concat(chunks))
+
+
+class TsvWriterTestCase(unittest.TestCase):
+    """Test io.TsvWriter class"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data = pd.DataFrame(dict(a=[str(i) for i in range(10)], b=['x', np.nan] * 5), dtype=object)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_output_is_valid(self):
+        """Test if TsvWriter writes the same file as to_tsv()"""
+        for filename in ('data.tsv', 'data.tsv.gz'):
+            filepath = Path(self.tmp_dir.name) / filename
+            with TsvWriter(filepath) as writer:
+                for i in range(0, len(self.data), 3):
+                    writer.write(self.data.iloc[i:i + 3])
+            pd.testing.assert_frame_equal(self.data, from_tsv(filepath))
+
+    def test_different_columns(self):
+        """Test if TsvWriter raises error if chunks have different columns"""
+        with TsvWriter(Path(self.tmp_dir.name) / 'data.tsv') as writer:
+            writer.write(self.data)
+            with self.assertRaises(ValueError):
+                writer.write(self.data[['b', 'a']])
+
+
+def count_words(lines: list) -> int:
+    return sum(len(line.split()) for line in lines)
+
+
+def add(outp: int, reduced_outp: int) -> int:
+    return outp + (reduced_outp or 0)
+
+
+class LinesTestCase(unittest.TestCase):
+    """Test io functions for text files with lines"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filepath = Path(self.tmp_dir.name) / 'lines.txt'
+        self.lines = [f'line {i} ' + 'ы' * (i % 7 + 1) for i in range(1000)]
+        write_lines(self.filepath, self.lines, batch_size=300)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_lines(self):
+        """Test if write_lines() writes lines that read_lines() reads back"""
+        self.assertEqual(self.lines, list(read_lines(self.filepath)))
+
+    def test_read_line_batches(self):
+        """Test if read_line_batches() reads the same lines as read_lines() in batches"""
+        batches = list(read_line_batches(self.filepath, buffer_size=1000))
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(self.lines, [line for batch in batches for line in batch])
+
+    def test_line_shards(self):
+        """Test if line_shards() splits file into adjacent shards aligned to lines"""
+        shards = line_shards(self.filepath, shards=7)
+        self.assertEqual(7, len(shards))
+        self.assertEqual(0, shards[0][0])
+        self.assertEqual(self.filepath.stat().st_size, shards[-1][1])
+        lines = []
+        for start, end in shards:
+            for batch in read_line_batches(self.filepath, buffer_size=100, start=start, end=end):
+                lines.extend(batch)
+        self.assertEqual(self.lines, lines)
+
+    def test_count_lines(self):
+        """Test if count_lines() counts lines in bytes, in text mode and in parallel"""
+        for workers in (1, 3):
+            self.assertEqual(1000, count_lines(self.filepath, workers=workers))
+        self.assertEqual(1000, count_lines(self.filepath, encoding='utf-8'))
+        self.filepath.write_text('a\nb')
+        self.assertEqual(2, count_lines(self.filepath))
+        self.filepath.write_text('')
+        self.assertEqual(0, count_lines(self.filepath, workers=2))
+
+    def test_map_lines(self):
+        """Test if map_lines() maps lines of all shards of file"""
+        expected = count_words(self.lines)
+        actual = map_lines(
+            self.filepath, workers=2, map_func=count_words, shard_size=1000, reduce_func=add, progress_bar=None)
+        self.assertEqual(expected, actual)
+
+
+if __name__ == '__main__':
+    unittest.main()
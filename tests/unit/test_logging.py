@@ -0,0 +1,138 @@
+import logging
+import re
+import tempfile
+import unittest
+from pathlib import Path
+
+from pysimple.logging import file_logger, daily_file_logger, queue_logger, console_logger, LoggerAdapter
+from pysimple.parallel import map_reduce
+
+# Logger of map_log function, forked workers inherit it
+LOGGER = None
+
+
+def map_log(x: int) -> int:
+    LOGGER.info(f'Mapped {x}')
+    return x
+
+
+class QueueLoggerTestCase(unittest.TestCase):
+    """Test logging.queue_logger() function"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = Path(self.tmp_dir.name) / 'test.log'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_messages(self) -> list:
+        return [re.sub(r'^\[.*?\]\[.*?\] ', '', line) for line in self.log_path.read_text().splitlines()]
+
+    def test_output_is_valid(self):
+        """Test if queued logger writes all records in order once listener is stopped"""
+        logger = file_logger('queued', log_path=self.log_path, prefix='test', queued=True)
+        for i in range(1000):
+            logger.info(f'Message {i}')
+        queue_handler, = logger.logger.handlers
+        queue_handler.listener.stop()
+        self.assertEqual([f'[test] Message {i}' for i in range(1000)], self.read_messages())
+
+    def test_drop(self):
+        """Test if queued logger with drop=True drops records if queue is full and reports them"""
+        logger = queue_logger(file_logger('dropping', log_path=self.log_path), queue_size=2, drop=True)
+        queue_handler, = logger.handlers
+        queue_handler.listener.stop()
+        for i in range(5):
+            logger.info(f'Message {i}')
+        self.assertEqual(3, queue_handler.dropped_)
+        queue_handler.listener.start()
+        queue_handler.listener.stop()
+        expected = ['Message 0', 'Message 1', 'Dropped 3 log records, because queue was full']
+        self.assertEqual(expected, self.read_messages())
+
+    def test_processes(self):
+        """Test if queued logger with processes=True writes records of forked workers into one file"""
+        global LOGGER
+        LOGGER = queue_logger(file_logger('processes', log_path=self.log_path), processes=True)
+        map_reduce(inputs=list(range(20)), workers=2, map_func=map_log, progress_bar=None, chunk_size=3)
+        LOGGER.handlers[0].listener.stop()
+        self.assertEqual(sorted(f'Mapped {x}' for x in range(20)), sorted(self.read_messages()))
+
+    def test_drop_in_processes(self):
+        """Test if queued logger with processes=True reports records dropped by forked workers"""
+        global LOGGER
+        LOGGER = queue_logger(
+            file_logger('dropping_processes', log_path=self.log_path), queue_size=1, drop=True, processes=True)
+        queue_handler, = LOGGER.handlers
+        queue_handler.listener.stop()
+        map_reduce(inputs=list(range(20)), workers=2, map_func=map_log, progress_bar=None, chunk_size=3)
+        self.assertEqual(19, queue_handler.dropped_)
+        queue_handler.listener.start()
+        queue_handler.listener.stop()
+        self.assertEqual('Dropped 19 log records, because queue was full', self.read_messages()[-1])
+
+    def test_factory_in_processes(self):
+        """Test if queued logger built by factory writes records of forked workers with or without processes=True"""
+        global LOGGER
+        for processes in (False, True):
+            LOGGER = file_logger(
+                f'factory_processes_{processes}', log_path=self.log_path, queued=True, queue_size=10,
+                processes=processes)
+            map_reduce(inputs=list(range(100)), workers=2, map_func=map_log, progress_bar=None, chunk_size=10)
+            LOGGER.handlers[0].listener.stop()
+            self.assertEqual(sorted(f'Mapped {x}' for x in range(100)), sorted(self.read_messages()))
+            self.log_path.unlink()
+
+    def test_daily_file_logger(self):
+        """Test if daily_file_logger() writes into file"""
+        logger = daily_file_logger('daily', log_path=self.log_path)
+        logger.info('Message')
+        self.assertEqual(['Message'], self.read_messages())
+
+
+class Formatted:
+    """Argument of message that counts how many times it was formatted"""
+
+    def __init__(self):
+        self.n_formatted = 0
+
+    def __str__(self):
+        self.n_formatted += 1
+        return 'formatted'
+
+
+class LoggerFactoryTestCase(unittest.TestCase):
+    """Test logging factories"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = Path(self.tmp_dir.name) / 'test.log'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_loggers_are_cached(self):
+        """Test if repeated calls of factories return the same logger, so that each record is written once"""
+        for _ in range(3):
+            logger = file_logger('cached', log_path=self.log_path, prefix='test')
+        logger.info('Message')
+        self.assertEqual(1, len(logger.logger.handlers))
+        self.assertEqual(1, len(self.log_path.read_text().splitlines()))
+        self.assertIs(console_logger('cached'), console_logger('cached'))
+        self.assertIsNot(console_logger('cached'), console_logger('other'))
+
+    def test_lazy_formatting(self):
+        """Test if LoggerAdapter formats message only if its level is enabled"""
+        logger = LoggerAdapter(console_logger('lazy'), prefix=('a', 'b'))
+        arg = Formatted()
+        logger.debug('Message %s', arg)
+        self.assertEqual(0, arg.n_formatted)
+        with self.assertLogs(logger.logger, level=logging.INFO) as logs:
+            logger.info('Message %s', arg)
+        self.assertEqual(['INFO:lazy:[a][b] Message formatted'], logs.output)
+        self.assertEqual('', LoggerAdapter(console_logger('lazy')).prefix)
+
+
+if __name__ == '__main__':
+    unittest.main()
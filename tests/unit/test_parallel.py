@@ -0,0 +1,400 @@
+import asyncio
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pysimple import parallel
+from pysimple.parallel import map_reduce, share, WorkerPool, SharedArray, TaskMetrics
+
+
+def square(x: int, power: int=2) -> int:
+    return x ** power
+
+
+def add(outp: int, reduced_outp: int) -> int:
+    return outp + (reduced_outp or 0)
+
+
+def append(outp: int, reduced_outp: list) -> list:
+    return (reduced_outp or []) + [outp]
+
+
+def concat(outp: list, reduced_outp: list) -> list:
+    return (reduced_outp or []) + outp
+
+
+def as_list(x: int) -> list:
+    return [x]
+
+
+def lookup(x: int, table: dict) -> int:
+    return table[x]
+
+
+def load_table(size: int) -> dict:
+    return dict(table={x: -x for x in range(size)})
+
+
+def worker_pid(x: int) -> int:
+    return os.getpid()
+
+
+def column_sums(data: pd.DataFrame) -> dict:
+    return {col: data[col].sum() for col in data.columns if col != 'text'}
+
+
+def is_view(array: np.ndarray) -> bool:
+    return not array.flags.writeable and not array.flags.owndata
+
+
+def singular_sum(array: np.ndarray) -> float:
+    if array[0] < 0:
+        raise np.linalg.LinAlgError('Singular matrix')
+    return float(array.sum())
+
+
+def shared_blocks() -> set:
+    return {name for name in os.listdir('/dev/shm') if name.startswith('psm_')}
+
+
+async def async_square(x: int, power: int=2) -> int:
+    await asyncio.sleep(0.001 * (x % 3))
+    return x ** power
+
+
+# Inputs seen by current process
+SEEN = set()
+
+
+def flaky_square(x: int) -> int:
+    if x not in SEEN:
+        SEEN.add(x)
+        raise RuntimeError(f'First attempt to map {x} fails!')
+    return x ** 2
+
+
+def slow_square(x: int) -> int:
+    if x not in SEEN:
+        SEEN.add(x)
+        time.sleep(10)
+    return x ** 2
+
+
+def failing_square(x: int) -> int:
+    raise RuntimeError('Must not be called!')
+
+
+class CountingBar:
+    """Progress bar that remembers its updates"""
+
+    instances = []
+
+    def __init__(self, total: int=None):
+        self.total = total
+        self.n = 0
+        self.postfix = None
+        CountingBar.instances.append(self)
+
+    def update(self, n: int=1):
+        self.n += n
+
+    def set_postfix_str(self, s: str, refresh: bool=True):
+        self.postfix = s
+
+    def close(self):
+        pass
+
+
+class MapReduceTestCase(unittest.TestCase):
+    """Test parallel.map_reduce() function"""
+
+    def test_output_is_valid(self):
+        """Test if map_reduce() returns expected map outputs"""
+        inp = list(range(10))
+        expected = [x ** 3 for x in inp]
+        for workers in (1, 2):
+            actual = map_reduce(inputs=inp, workers=workers, map_func=square, progress_bar=None, power=3)
+            self.assertEqual(expected, actual)
+
+    def test_reduce_func(self):
+        """Test if map_reduce() reduces map outputs"""
+        inp = list(range(10))
+        expected = sum(x ** 2 for x in inp)
+        for workers in (1, 2):
+            actual = map_reduce(inputs=inp, workers=workers, map_func=square, reduce_func=add, progress_bar=None)
+            self.assertEqual(expected, actual)
+
+    def test_streaming_input(self):
+        """Test if map_reduce() with chunk_size works with iterator as input"""
+        expected = sum(x ** 2 for x in range(100))
+        for workers in (1, 3):
+            actual = map_reduce(
+                inputs=iter(range(100)), workers=workers, map_func=square, reduce_func=add, progress_bar=None,
+                chunk_size=7)
+            self.assertEqual(expected, actual)
+
+    def test_streaming_preserves_order(self):
+        """Test if map_reduce() with chunk_size reduces outputs in order of inputs"""
+        inp = ((x,) for x in range(50))
+        expected = [x ** 2 for x in range(50)]
+        actual = map_reduce(
+            inputs=inp, workers=3, map_func=square, reduce_func=append, progress_bar=None, chunk_size=4)
+        self.assertEqual(expected, actual)
+
+    def test_streaming_unordered(self):
+        """Test if map_reduce() with ordered=False returns all outputs"""
+        expected = [x ** 2 for x in range(50)]
+        actual = map_reduce(
+            inputs=range(50), workers=3, map_func=square, progress_bar=None, chunk_size=4, ordered=False)
+        self.assertEqual(sorted(expected), sorted(actual))
+
+    def test_progress_bar(self):
+        """Test if map_reduce() updates progress bar with all inputs and reports utilization of workers"""
+        CountingBar.instances.clear()
+        map_reduce(inputs=list(range(100)), workers=2, map_func=square, progress_bar=CountingBar)
+        bar, = CountingBar.instances
+        self.assertEqual(100, bar.total)
+        self.assertEqual(100, bar.n)
+        self.assertIn('utilization', bar.postfix)
+
+    def test_associative(self):
+        """Test if map_reduce() with associative=True returns the same output as serial reduction"""
+        inp = list(range(101))
+        expected = map_reduce(inputs=inp, workers=1, map_func=as_list, reduce_func=concat, progress_bar=None)
+        self.assertEqual(inp, expected)
+        for chunk_size in (None, 1, 3, 200):
+            actual = map_reduce(
+                inputs=inp, workers=3, map_func=as_list, reduce_func=concat, progress_bar=None, chunk_size=chunk_size,
+                associative=True)
+            self.assertEqual(expected, actual)
+
+    def test_shared_memory(self):
+        """Test if map_reduce() with shared_memory=True passes numeric data as views"""
+        batches = [
+            pd.DataFrame(dict(a=np.arange(10_000) + i, b=np.random.random(10_000), text='abc')) for i in range(5)]
+        expected = [column_sums(batch) for batch in batches]
+        actual = map_reduce(
+            inputs=batches, workers=2, map_func=column_sums, progress_bar=None, chunk_size=2, shared_memory=True)
+        self.assertEqual(expected, actual)
+
+        arrays = [np.arange(10_000) * i for i in range(5)]
+        actual = map_reduce(
+            inputs=arrays, workers=2, map_func=is_view, progress_bar=None, chunk_size=2, shared_memory=True)
+        self.assertEqual([True] * 5, actual)
+
+    @unittest.skipUnless(os.path.isdir('/dev/shm'), 'Shared memory is not mounted into /dev/shm')
+    def test_shared_memory_is_released(self):
+        """Test if map_reduce() with shared_memory=True destroys all shared memory blocks, even if task fails"""
+        blocks = shared_blocks()
+        arrays = [np.ones(100_000) for _ in range(20)]
+        actual = map_reduce(
+            inputs=arrays, workers=2, map_func=singular_sum, progress_bar=None, chunk_size=1, shared_memory=True)
+        self.assertEqual([100_000.] * 20, actual)
+        self.assertEqual(blocks, shared_blocks())
+
+        arrays[5] = -arrays[5]
+        with self.assertRaises(np.linalg.LinAlgError):
+            map_reduce(
+                inputs=arrays, workers=2, map_func=singular_sum, progress_bar=None, chunk_size=1, shared_memory=True)
+        self.assertEqual(blocks, shared_blocks())
+
+    def test_costs(self):
+        """Test if map_reduce() with costs returns outputs in order of inputs"""
+        inp = list(range(50))
+        expected = [x ** 2 for x in inp]
+        for costs in ([x % 7 for x in inp], square):
+            actual = map_reduce(inputs=inp, workers=3, map_func=square, progress_bar=None, costs=costs)
+            self.assertEqual(expected, actual)
+            actual = map_reduce(
+                inputs=inp, workers=3, map_func=as_list, reduce_func=concat, progress_bar=None, costs=costs)
+            self.assertEqual(inp, actual)
+
+    def test_zero_costs(self):
+        """Test if map_reduce() with zero costs splits inputs into chunks by their number"""
+        self.assertEqual(
+            [[7, 8, 9], [4, 5, 6], [2, 3], [0, 1]], parallel._balance_chunks(costs=[0] * 10, n_chunks=4))
+        inp = list(range(20))
+        actual = map_reduce(inputs=inp, workers=3, map_func=square, progress_bar=None, costs=[0] * 20)
+        self.assertEqual([x ** 2 for x in inp], actual)
+
+    def test_invalid_costs(self):
+        """Test if map_reduce() raises error if number of costs does not match number of inputs"""
+        with self.assertRaises(ValueError):
+            map_reduce(inputs=list(range(5)), workers=2, map_func=square, progress_bar=None, costs=[1, 2])
+
+    def test_thread_backend(self):
+        """Test if map_reduce() with thread backend maps inputs in threads of current process"""
+        inp = list(range(20))
+        actual = map_reduce(inputs=inp, workers=2, map_func=square, progress_bar=None, backend='thread', power=3)
+        self.assertEqual([x ** 3 for x in inp], actual)
+        actual = map_reduce(inputs=inp, workers=2, map_func=worker_pid, progress_bar=None, backend='thread')
+        self.assertEqual({os.getpid()}, set(actual))
+
+    def test_asyncio_backend(self):
+        """Test if map_reduce() with asyncio backend awaits coroutines"""
+        inp = list(range(20))
+        expected = [x ** 3 for x in inp]
+        actual = map_reduce(inputs=inp, workers=4, map_func=async_square, progress_bar=None, backend='asyncio', power=3)
+        self.assertEqual(expected, actual)
+        actual = map_reduce(
+            inputs=iter(inp), workers=4, map_func=async_square, progress_bar=None, backend='asyncio', ordered=False,
+            power=3)
+        self.assertEqual(sorted(expected), sorted(actual))
+        actual = map_reduce(
+            inputs=inp, workers=4, map_func=async_square, reduce_func=append, progress_bar=CountingBar,
+            backend='asyncio')
+        self.assertEqual([x ** 2 for x in inp], actual)
+
+    def test_invalid_backend(self):
+        """Test if map_reduce() raises error for unknown backend"""
+        with self.assertRaises(ValueError):
+            map_reduce(inputs=[1], workers=2, map_func=square, backend='gpu')
+
+    def test_retries(self):
+        """Test if map_reduce() repeats failed map_func calls"""
+        SEEN.clear()
+        inp = list(range(10))
+        with self.assertRaises(RuntimeError):
+            map_reduce(inputs=inp, workers=1, map_func=flaky_square, progress_bar=None)
+        SEEN.clear()
+        for workers in (1, 2):
+            actual = map_reduce(inputs=inp, workers=workers, map_func=flaky_square, progress_bar=None, retries=1)
+            self.assertEqual([x ** 2 for x in inp], actual)
+
+    def test_timeout(self):
+        """Test if map_reduce() interrupts map_func calls that do not complete in time"""
+        SEEN.clear()
+        with self.assertRaises(TimeoutError):
+            map_reduce(inputs=[1, 2], workers=2, map_func=slow_square, progress_bar=None, timeout=0.1)
+        SEEN.clear()
+        actual = map_reduce(inputs=[1, 2], workers=2, map_func=slow_square, progress_bar=None, timeout=0.1, retries=1)
+        self.assertEqual([1, 4], actual)
+
+    def test_timeout_outside_of_main_thread(self):
+        """Test if map_reduce() with timeout in one worker raises clear error outside of main thread"""
+        errors = []
+
+        def run():
+            try:
+                map_reduce(inputs=[1, 2], workers=1, map_func=square, progress_bar=None, timeout=1)
+            except ValueError as e:
+                errors.append(str(e))
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertEqual(['Timeout with workers=1 is supported only in main thread!'], errors)
+
+    def test_checkpoint_dir(self):
+        """Test if map_reduce() with checkpoint_dir skips chunks mapped before"""
+        inp = list(range(20))
+        expected = sum(x ** 2 for x in inp)
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            for map_func in (square, failing_square):
+                for workers in (1, 3):
+                    actual = map_reduce(
+                        inputs=inp, workers=workers, map_func=map_func, reduce_func=add, progress_bar=None,
+                        chunk_size=3, checkpoint_dir=checkpoint_dir)
+                    self.assertEqual(expected, actual)
+            self.assertEqual(7, len(os.listdir(checkpoint_dir)))
+
+    def test_metrics(self):
+        """Test if map_reduce() with metrics records each chunk and summarizes them"""
+        inp = list(range(20))
+        for workers, backend in ((1, 'process'), (2, 'process'), (2, 'thread')):
+            metrics = TaskMetrics()
+            actual = map_reduce(
+                inputs=inp, workers=workers, map_func=square, progress_bar=None, chunk_size=3, backend=backend,
+                metrics=metrics)
+            self.assertEqual([x ** 2 for x in inp], actual)
+            summary = metrics.summary()
+            self.assertEqual(7, summary['tasks'])
+            self.assertEqual(20, summary['inputs'])
+            self.assertLessEqual(summary['workers'], workers)
+            self.assertGreaterEqual(summary['latency_max'], summary['latency_p50'])
+            self.assertEqual(workers > 1 and backend == 'process', summary['serialization_time'] > 0)
+            self.assertGreater(summary['peak_rss'], 0)
+
+    def test_metrics_output(self):
+        """Test if TaskMetrics logs summary and dumps trace of tasks"""
+        metrics = TaskMetrics()
+        map_reduce(
+            inputs=list(range(10)), workers=2, map_func=square, reduce_func=add, progress_bar=None, chunk_size=5,
+            metrics=metrics)
+        with self.assertLogs('metrics', level=logging.INFO) as logs:
+            metrics.log(logging.getLogger('metrics'))
+        self.assertIn('tasks=2', logs.output[0])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, 'trace.json')
+            metrics.dump_trace(filepath)
+            with open(filepath) as f:
+                events = json.load(f)['traceEvents']
+        self.assertEqual(['task 0', 'task 1'], sorted(event['name'] for event in events if event['cat'] == 'task'))
+        self.assertEqual(2, sum(event['name'] == 'compute' for event in events))
+
+
+class ShareTestCase(unittest.TestCase):
+    """Test parallel.share() function"""
+
+    def test_small_objects_are_not_shared(self):
+        """Test if share() keeps small and non-numeric objects as is"""
+        for obj in (np.arange(10), pd.Series(['a'] * 100_000), 'text', None):
+            self.assertIs(obj, share(obj))
+
+    def test_array(self):
+        """Test if share() moves large numeric array into shared memory"""
+        array = np.arange(100_000)
+        shared = share(array)
+        self.assertIsInstance(shared, SharedArray)
+        pickled = pickle.dumps(shared)
+        self.assertLess(len(pickled), 1000)
+        actual = pickle.loads(pickled)
+        np.testing.assert_array_equal(array, actual)
+        self.assertFalse(actual.flags.writeable)
+        del actual
+        parallel._release_attached()
+        shared.unlink()
+
+
+class WorkerPoolTestCase(unittest.TestCase):
+    """Test parallel.WorkerPool class"""
+
+    def test_shared_kwargs(self):
+        """Test if WorkerPool passes shared_kwargs to map_func"""
+        table = {x: x * 10 for x in range(10)}
+        for context in ('fork', 'spawn'):
+            with WorkerPool(workers=2, shared_kwargs=dict(table=table), context=context) as pool:
+                actual = pool.map_reduce(inputs=list(range(10)), map_func=lookup, progress_bar=None)
+            self.assertEqual([table[x] for x in range(10)], actual)
+
+    def test_initializer(self):
+        """Test if WorkerPool passes outputs of initializer to map_func"""
+        with WorkerPool(workers=2, initializer=load_table, initargs=(10,)) as pool:
+            actual = pool.map_reduce(inputs=list(range(10)), map_func=lookup, progress_bar=None, chunk_size=3)
+        self.assertEqual([-x for x in range(10)], actual)
+
+    def test_thread_backend(self):
+        """Test if WorkerPool with thread backend passes shared_kwargs to map_func"""
+        table = {x: x * 10 for x in range(10)}
+        with WorkerPool(workers=2, shared_kwargs=dict(table=table), backend='thread') as pool:
+            actual = pool.map_reduce(inputs=list(range(10)), map_func=lookup, progress_bar=None)
+        self.assertEqual([table[x] for x in range(10)], actual)
+
+    def test_workers_are_reused(self):
+        """Test if WorkerPool runs repeated map_reduce calls with the same workers"""
+        with WorkerPool(workers=2) as pool:
+            pids1 = set(pool.map_reduce(inputs=list(range(20)), map_func=worker_pid, progress_bar=None))
+            pids2 = set(pool.map_reduce(inputs=list(range(20)), map_func=worker_pid, progress_bar=None))
+        self.assertLessEqual(len(pids1 | pids2), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,6 +22,43 @@ class BootstrapTestCase(unittest.TestCase):
         self.assertAlmostEqual(x_percentile1, 0.496, delta=0.001)
         self.assertAlmostEqual(x_percentile2, 0.504, delta=0.001)
 
+    def test_seed(self):
+        """Test if bootstrap() with seed returns the same output in one worker and in parallel"""
+        x = np.random.random(size=10_000)
+        for statistics in (['mean', 'std'], [np.median]):
+            expected = bootstrap(x=x, samples=100, seed=1, statistics=statistics, chunk_values=30_000)
+            actual = bootstrap(x=x, samples=100, seed=1, statistics=statistics, chunk_values=30_000, workers=3)
+            for name in expected:
+                np.testing.assert_allclose(expected[name], actual[name])
+        expected, actual = (bootstrap(x=x, samples=100, seed=np.random.default_rng(1)) for _ in range(2))
+        self.assertEqual(expected, actual)
+
+    def test_statistics(self):
+        """Test if bootstrap() returns actual value and percentiles around it for each statistic"""
+        x = np.random.normal(size=10_000)
+        for method in ('multinomial', 'poisson'):
+            actual = bootstrap(x=x, samples=200, seed=1, method=method, statistics=['mean', 'sum', 'var', 'std'])
+            expected = dict(mean=np.mean(x), sum=np.sum(x), var=np.var(x), std=np.std(x))
+            for name, (value, percentile1, percentile2) in actual.items():
+                self.assertAlmostEqual(expected[name], value)
+                self.assertLess(percentile1, value)
+                self.assertGreater(percentile2, value)
+        x_median, x_percentile1, x_percentile2 = bootstrap(x=x, seed=1, statistics=[np.median])['median']
+        self.assertEqual(np.median(x), x_median)
+        self.assertLess(x_percentile1, x_median)
+        self.assertGreater(x_percentile2, x_median)
+
+    def test_weights(self):
+        """Test if bootstrap() with weights returns weighted statistic"""
+        x = np.random.random(size=1000)
+        weights = np.random.randint(1, 5, size=1000)
+        x_mean, x_percentile1, x_percentile2 = bootstrap(x=x, weights=weights, seed=1)
+        self.assertAlmostEqual(np.average(x, weights=weights), x_mean)
+        self.assertLess(x_percentile1, x_mean)
+        self.assertGreater(x_percentile2, x_mean)
+        with self.assertRaises(ValueError):
+            bootstrap(x=x, weights=weights, statistics=[np.median])
+
 
 if __name__ == '__main__':
     unittest.main()
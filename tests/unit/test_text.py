@@ -1,8 +1,18 @@
 import unittest
 
+from ctypes import c_long
+
+import numpy as np
 import pandas as pd
+from cityhash import CityHash64
+
+from pysimple.text import flatten_text, normalize_text
 
-from pysimple.text import flatten_text
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
 
 
 class FlattenTextTestCase(unittest.TestCase):
@@ -33,5 +43,38 @@ class FlattenTextTestCase(unittest.TestCase):
         self.assertTrue(data['valid'].all())
 
 
+class NormalizeTextTestCase(unittest.TestCase):
+    """Test text.normalize_text() function"""
+
+    def setUp(self):
+        self.texts = pd.Series([f' Text\t{i}\n ﬁ ' for i in range(100)] + [np.nan], index=np.arange(101)[::-1])
+        self.expected = pd.Series(
+            [f'text {i} fi' for i in range(100)] + ['nan'], index=self.texts.index)
+
+    def test_output_is_valid(self):
+        """Test if normalize_text() applies all steps to each text"""
+        for workers in (1, 2):
+            actual = normalize_text(self.texts, steps=['flatten', 'nfkc', 'lower'], workers=workers, chunk_size=30)
+            pd.testing.assert_series_equal(self.expected, actual)
+        actual = normalize_text(self.texts, steps=['flatten', str.upper])
+        self.assertEqual('TEXT 0 FI', actual.iloc[0])
+
+    def test_hash(self):
+        """Test if normalize_text() with hash step returns hashes of normalized texts"""
+        expected = self.expected.map(lambda text: c_long(CityHash64(text)).value).astype(np.int64)
+        for workers in (1, 2):
+            actual = normalize_text(
+                self.texts, steps=['flatten', 'nfkc', 'lower', 'hash'], workers=workers, chunk_size=30)
+            pd.testing.assert_series_equal(expected, actual)
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_pyarrow(self):
+        """Test if normalize_text() normalizes pyarrow strings into pyarrow strings"""
+        texts = self.texts.astype('string[pyarrow]')
+        actual = normalize_text(texts, steps=['flatten'], dtype='string[pyarrow]')
+        self.assertEqual('pyarrow', actual.dtype.storage)
+        self.assertEqual(flatten_text(self.texts.iloc[:-1]).tolist(), actual.iloc[:-1].tolist())
+
+
 if __name__ == '__main__':
     unittest.main()
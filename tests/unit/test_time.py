@@ -0,0 +1,85 @@
+import json
+import logging
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from pysimple.time import Stopwatch, Timings, profile
+
+
+class StopwatchTestCase(unittest.TestCase):
+    """Test time.Stopwatch class"""
+
+    def test_elapsed(self):
+        """Test if Stopwatch reports time of finished block"""
+        with Stopwatch() as stopwatch:
+            time.sleep(0.01)
+            self.assertGreaterEqual(stopwatch.elapsed_ms(), 10)
+            time.sleep(0.01)
+        elapsed_ms = stopwatch.elapsed_ms()
+        self.assertGreaterEqual(elapsed_ms, 20)
+        time.sleep(0.01)
+        self.assertEqual(elapsed_ms, stopwatch.elapsed_ms())
+
+    def test_not_started(self):
+        """Test if Stopwatch raises error if it was not started"""
+        with self.assertRaises(ValueError):
+            Stopwatch().elapsed_ms()
+
+
+class TimingsTestCase(unittest.TestCase):
+    """Test time.Timings class"""
+
+    def setUp(self):
+        self.timings = Timings()
+
+    def test_nested_timers(self):
+        """Test if Timings aggregates durations of nested timers and decorated functions by path of names"""
+
+        @self.timings.timer('parse')
+        def parse():
+            time.sleep(0.001)
+
+        for _ in range(3):
+            with self.timings.timer('load'):
+                parse()
+                parse()
+        parse()
+        stats = self.timings.stats()
+        self.assertEqual(['load', 'load/parse', 'parse'], list(stats))
+        self.assertEqual([3, 6, 1], [stats[name]['count'] for name in stats])
+        self.assertGreaterEqual(stats['load']['total'], stats['load/parse']['total'])
+        for name_stats in stats.values():
+            self.assertLessEqual(name_stats['p50'], name_stats['p95'])
+            self.assertLessEqual(name_stats['p95'], name_stats['max'])
+
+    def test_output(self):
+        """Test if Timings logs and dumps stats of each timer"""
+        self.timings.add('load', seconds=1.5)
+        with self.assertLogs('timings', level=logging.INFO) as logs:
+            self.timings.log(logging.getLogger('timings'))
+        self.assertEqual(['INFO:timings:load: count=1, total=1.5, p50=1.5, p95=1.5, max=1.5'], logs.output)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = Path(tmp_dir) / 'timings.json'
+            self.timings.dump_json(filepath)
+            self.assertEqual(1.5, json.loads(filepath.read_text())['load']['max'])
+
+
+class ProfileTestCase(unittest.TestCase):
+    """Test time.profile() function"""
+
+    def test_output_is_valid(self):
+        """Test if profile() logs profiled functions and allocations and dumps stats"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = Path(tmp_dir) / 'stats.prof'
+            with self.assertLogs('profile', level=logging.INFO) as logs:
+                with profile(logger=logging.getLogger('profile'), filepath=filepath, memory=True):
+                    sorted(str(i) for i in range(10_000))
+            self.assertTrue(filepath.exists())
+        self.assertIn('sorted', logs.output[0])
+        self.assertIn('Peak traced memory', logs.output[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,22 @@
+import datetime as dt
 import unittest
 from typing import *
 
+from ctypes import c_long
+
+import numpy as np
 import pandas as pd
+from cityhash import CityHash64
+
+from pysimple.utils import (
+    flatten_iter, df2dict, split_list, compute_hash64, data2batches, split_into_batches, diff_between_dates,
+    get_dates_between)
 
-from pysimple.utils import flatten_iter, df2dict, split_list
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
 
 
 class FlattenIterTestCase(unittest.TestCase):
@@ -46,6 +59,14 @@ class Df2DictTestCase(unittest.TestCase):
         actual = df2dict(inp)
         self.assertEqual(expected, actual)
 
+    def test_mixed_types(self):
+        """Test if df2dict() keeps types of values in columns of different types"""
+        inp = pd.DataFrame(dict(a=[1, 2], b=[0.5, 1.5], c=['x', 'y']), index=[7, 7])
+        expected = inp.to_dict(orient='records')
+        actual = df2dict(inp)
+        self.assertEqual(expected, actual)
+        self.assertIsInstance(actual[0]['a'], int)
+
     def test_empty_input(self):
         """Test if df2dict() works with empty DataFrame as input"""
         expected = []
@@ -132,5 +153,147 @@ class SplitListTestCase(unittest.TestCase):
         self.assertEqual(expected, actual)
 
 
+class Data2BatchesTestCase(unittest.TestCase):
+    """Test utils.data2batches() function"""
+
+    def setUp(self):
+        self.data = pd.DataFrame(dict(a=range(10), b=[str(i) for i in range(10)]))
+
+    def test_output_is_valid(self):
+        """Test if data2batches() splits table into consecutive batches"""
+        batches = list(data2batches(self.data, batch_size=4))
+        self.assertEqual([4, 4, 2], [len(batch) for batch in batches])
+        pd.testing.assert_frame_equal(self.data, pd.concat(batches))
+        self.assertEqual([4, 4, 2], [len(batch) for batch in data2batches(self.data, n_batches=3)])
+
+    def test_records(self):
+        """Test if data2batches() with orient='records' splits records into consecutive batches"""
+        batches = data2batches(self.data, batch_size=4, orient='records')
+        self.assertIsInstance(batches, Iterator)
+        batches = list(batches)
+        self.assertEqual([4, 4, 2], [len(batch) for batch in batches])
+        self.assertEqual(df2dict(self.data), [record for batch in batches for record in batch])
+
+    def test_empty_data(self):
+        """Test if data2batches() yields no batches for empty table"""
+        for orient in (None, 'records'):
+            self.assertEqual([], list(data2batches(self.data.iloc[:0], n_batches=3, orient=orient)))
+            self.assertEqual([], list(data2batches(self.data.iloc[:0], batch_size=4, orient=orient)))
+
+    def test_float_batch_size(self):
+        """Test if data2batches() accepts batch_size of float type"""
+        self.assertEqual([4, 4, 2], [len(batch) for batch in data2batches(self.data, batch_size=4.)])
+
+
+class SplitIntoBatchesTestCase(unittest.TestCase):
+    """Test utils.split_into_batches() function"""
+
+    def setUp(self):
+        self.data = pd.DataFrame(dict(a=[3, 1, 2, 1, 3, 0, 2, 1], b=['x', 'y'] * 4, c=range(8)))
+
+    def test_output_is_valid(self):
+        """Test if split_into_batches() splits groups of rows between batches"""
+        batches = list(split_into_batches(self.data, split_cols=['a'], n_batches=2))
+        self.assertEqual([[1, 3, 5, 7], [0, 2, 4, 6]], [batch['c'].tolist() for batch in batches])
+        batches = list(split_into_batches(self.data, split_cols=['a', 'b'], n_batches=3))
+        self.assertEqual(list(range(8)), sorted(c for batch in batches for c in batch['c']))
+        groups = [set(zip(batch['a'], batch['b'])) for batch in batches]
+        self.assertEqual(sum(map(len, groups)), len(set.union(*groups)))
+
+    def test_input_is_not_modified(self):
+        """Test if split_into_batches() does not add columns to input"""
+        list(split_into_batches(self.data, split_cols=['a'], n_batches=2))
+        self.assertEqual(['a', 'b', 'c'], list(self.data.columns))
+
+
+class DiffBetweenDatesTestCase(unittest.TestCase):
+    """Test utils.diff_between_dates() function"""
+
+    def test_arrays(self):
+        """Test if diff_between_dates() returns the same deltas for arrays as for dates one by one"""
+        from_dates = [dt.datetime(2020, 1, 1, 12), dt.datetime(2020, 3, 1), dt.datetime(2020, 1, 2, 0, 0, 30)]
+        till_dates = [dt.datetime(2020, 1, 3, 11, 59, 59, 500), dt.datetime(2020, 1, 1), dt.datetime(2020, 1, 2)]
+        for delta in ('day', 'hour', 'min', 'sec'):
+            expected = [diff_between_dates(f, t, delta=delta) for f, t in zip(from_dates, till_dates)]
+            actual = diff_between_dates(np.array(from_dates), np.array(till_dates), delta=delta)
+            self.assertEqual(expected, actual.tolist())
+            actual = diff_between_dates(pd.Series(from_dates), pd.Series(till_dates), delta=delta)
+            self.assertEqual(expected, actual.tolist())
+
+    def test_invalid_delta(self):
+        """Test if diff_between_dates() raises error for unknown delta"""
+        with self.assertRaises(ValueError):
+            diff_between_dates(dt.date(2020, 1, 1), dt.date(2020, 1, 2), delta='week')
+
+
+class GetDatesBetweenTestCase(unittest.TestCase):
+    """Test utils.get_dates_between() function"""
+
+    def test_arrays(self):
+        """Test if get_dates_between() returns the same dates for arrays as for dates one by one"""
+        start_dates = pd.Series(
+            pd.to_datetime(['2020-01-01 00:00', '2020-01-05 12:00', '2020-01-03 00:00']), index=[5, 6, 7])
+        end_dates = pd.Series(
+            pd.to_datetime(['2020-01-03 01:00', '2020-01-06 00:00', '2020-01-01 00:00']), index=[5, 6, 7])
+        for delta_args in (dict(days=1), dict(hours=6), dict(minutes=90)):
+            expected = [
+                (i, date) for i, start_date, end_date in zip(start_dates.index, start_dates, end_dates)
+                for date in get_dates_between(start_date, end_date, **delta_args)]
+            actual = get_dates_between(start_dates, end_dates, **delta_args)
+            self.assertEqual(expected, list(actual.items()))
+
+    def test_scalar_end_date(self):
+        """Test if get_dates_between() returns ranges of dates for array of start dates till the same end date"""
+        start_dates = np.array(['2020-01-01', '2020-01-02'], dtype='datetime64[ns]')
+        actual = get_dates_between(start_dates, pd.Timestamp('2020-01-03'), days=1)
+        self.assertEqual(['2020-01-01', '2020-01-02', '2020-01-02'], actual.dt.strftime('%Y-%m-%d').tolist())
+        self.assertEqual([0, 0, 1], actual.index.tolist())
+
+    def test_timezone(self):
+        """Test if get_dates_between() keeps timezone of dates as it does for dates one by one"""
+        start_dates = pd.Series(pd.to_datetime(['2020-01-01', '2020-01-05'])).dt.tz_localize('Europe/Kyiv')
+        end_dates = start_dates + pd.Timedelta(days=2)
+        expected = [
+            (i, date) for i, start_date, end_date in zip(start_dates.index, start_dates, end_dates)
+            for date in get_dates_between(start_date, end_date, days=1)]
+        actual = get_dates_between(start_dates, end_dates, days=1)
+        self.assertEqual(expected, list(actual.items()))
+        self.assertEqual(['00:00'] * 4, actual.dt.strftime('%H:%M').tolist())
+        with self.assertRaises(ValueError):
+            get_dates_between(start_dates, end_dates.dt.tz_convert('UTC'), days=1)
+
+
+class ComputeHash64TestCase(unittest.TestCase):
+    """Test utils.compute_hash64() function"""
+
+    def setUp(self):
+        self.texts = [f'id{i}' for i in range(1000)]
+        self.expected = [c_long(CityHash64(text)).value for text in self.texts]
+
+    def test_text(self):
+        """Test if compute_hash64() returns signed hash for text"""
+        self.assertEqual(self.expected[:3], [compute_hash64(text) for text in self.texts[:3]])
+
+    def test_series(self):
+        """Test if compute_hash64() returns the same hashes for Series as for texts one by one"""
+        inp = pd.Series(self.texts, index=np.arange(1000)[::-1], name='id')
+        expected = pd.Series(self.expected, index=inp.index, name='id', dtype=np.int64)
+        pd.testing.assert_series_equal(expected, compute_hash64(inp))
+        self.assertEqual(0, len(compute_hash64(pd.Series([], dtype=object))))
+
+    def test_array(self):
+        """Test if compute_hash64() returns the same hashes for array as for texts one by one"""
+        for inp in (np.array(self.texts), np.array(self.texts, dtype=object)):
+            actual = compute_hash64(inp)
+            self.assertEqual(np.int64, actual.dtype)
+            self.assertEqual(self.expected, actual.tolist())
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_pyarrow(self):
+        """Test if compute_hash64() returns the same hashes for pyarrow arrays as for texts one by one"""
+        for inp in (pyarrow.array(self.texts), pyarrow.chunked_array([self.texts[:500], self.texts[500:]])):
+            self.assertEqual(self.expected, compute_hash64(inp).tolist())
+
+
 if __name__ == '__main__':
     unittest.main()